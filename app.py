@@ -1,23 +1,27 @@
 # app.py
 import streamlit as st
-import pandas as pd
 import os
 from datetime import datetime
-import io
-import matplotlib.pyplot as plt
-import base64
+from concurrent.futures import TimeoutError as FutureTimeout
 import hashlib
 
+# pandas, the expense store, the chart layer and the PDF/import helpers are
+# imported further down, where they are first needed, so the login page
+# renders without loading them.
+from user_store import get_user_store
+import tracing
+
 # ---------------------------
 # CONFIG
 # ---------------------------
 st.set_page_config(page_title="Expense Tracker (Full)", page_icon="💰", layout="wide")
+tracing.start_rerun()
 
 BASE_DIR = os.getcwd()
 USERS_FILE = os.path.join(BASE_DIR, "users.csv")
+USERS_DB = os.path.join(BASE_DIR, "users.db")
 DATA_DIR = os.path.join(BASE_DIR, "user_data")
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+PDF_WAIT_SECONDS = 5
 
 # ---------------------------
 # HELPERS
@@ -27,113 +31,45 @@ def hash_password(password: str):
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 def init_users_file():
-    if not os.path.exists(USERS_FILE):
-        df = pd.DataFrame(columns=["username", "password_hash"])
-        df.to_csv(USERS_FILE, index=False)
-
-def user_file(username):
-    safe = username.replace(" ", "_")
-    return os.path.join(DATA_DIR, f"{safe}_expenses.csv")
+    users = get_user_store(USERS_DB)
+    # One-shot import of accounts created before the SQLite store existed
+    if users.created and os.path.exists(USERS_FILE):
+        users.import_csv(USERS_FILE)
+        users.created = False
+    return users
+
+def get_store():
+    # Imported on first use, so the login page doesn't load pandas and the store
+    from expense_backends import get_expense_store
+    return get_expense_store(DATA_DIR)
 
 def init_user_file(username):
-    fn = user_file(username)
-    if not os.path.exists(fn):
-        df = pd.DataFrame(columns=["Date", "Amount", "Category", "Description"])
-        df.to_csv(fn, index=False)
+    get_store().init_user(username)
 
+@tracing.traced("store.read")
 def read_user_expenses(username):
-    fn = user_file(username)
-    if not os.path.exists(fn):
-        init_user_file(username)
-    return pd.read_csv(fn, parse_dates=["Date"], dayfirst=False)
+    return store.read(username)
 
 def save_user_expenses(username, df):
-    fn = user_file(username)
-    # Ensure Date column is formatted
-    df = df.copy()
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"]).dt.date
-    df.to_csv(fn, index=False)
+    store.save(username, df)
 
+@tracing.traced("store.month_slice")
+def month_expenses(username, year, month):
+    # A binary search on the ledger's date index, or a (user, date) range query with SQLite
+    df_month = store.month(username, year, month)
+    return df_month.assign(Date=df_month["Date"].dt.date)
+
+@tracing.traced("store.add")
 def add_expense(username, date, amount, category, description):
-    df = read_user_expenses(username)
-    new_row = {"Date": pd.to_datetime(date).date(), "Amount": float(amount), "Category": category, "Description": description}
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    save_user_expenses(username, df)
-
-def delete_expense(username, idx):
-    df = read_user_expenses(username)
-    if idx in df.index:
-        df = df.drop(idx).reset_index(drop=True)
-        save_user_expenses(username, df)
-
-def edit_expense(username, idx, date, amount, category, description):
-    df = read_user_expenses(username)
-    if idx in df.index:
-        df.loc[idx, ["Date", "Amount", "Category", "Description"]] = [pd.to_datetime(date).date(), float(amount), category, description]
-        save_user_expenses(username, df)
+    return store.add(username, date, amount, category, description)
 
-# ---------------------------
-# PDF generation (reportlab)
-# ---------------------------
+@tracing.traced("store.delete")
+def delete_expense(username, expense_id, expected_version=None):
+    store.delete(username, expense_id, expected_version=expected_version)
 
-def create_month_summary_pdf(username, df_month, year, month, salary):
-    """
-    Create a simple PDF summary for the selected month for the given user.
-    Requires reportlab (pip install reportlab).
-    Returns bytes of PDF.
-    """
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import inch
-    except Exception as e:
-        raise RuntimeError("reportlab not installed. Install via `pip install reportlab` to enable PDF export.") from e
-
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    title = f"Expense Summary - {username} - {month}/{year}"
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(1 * inch, height - 1 * inch, title)
-
-    c.setFont("Helvetica", 11)
-    total = df_month["Amount"].sum()
-    balance = salary - total if salary is not None else None
-    c.drawString(1 * inch, height - 1.4 * inch, f"Total expenses: ₹{total:.2f}")
-    if salary is not None:
-        c.drawString(1 * inch, height - 1.6 * inch, f"Salary: ₹{salary:.2f}")
-        c.drawString(1 * inch, height - 1.8 * inch, f"Remaining balance: ₹{balance:.2f}")
-
-    # Show top categories
-    c.drawString(1 * inch, height - 2.2 * inch, "Top categories:")
-    cat_sum = df_month.groupby("Category")["Amount"].sum().sort_values(ascending=False)
-    y = height - 2.5 * inch
-    for cat, amt in cat_sum.items():
-        c.drawString(1.1 * inch, y, f"{cat}: ₹{amt:.2f}")
-        y -= 0.2 * inch
-        if y < 1 * inch:
-            c.showPage()
-            y = height - 1 * inch
-
-    # Add table of transactions (simple)
-    c.showPage()
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(1 * inch, height - 1 * inch, "Transactions")
-    c.setFont("Helvetica", 10)
-    y = height - 1.4 * inch
-    for _, r in df_month.sort_values("Date").iterrows():
-        line = f"{r['Date']} | ₹{r['Amount']:.2f} | {r['Category']} | {str(r['Description'])[:60]}"
-        c.drawString(1 * inch, y, line)
-        y -= 0.18 * inch
-        if y < 1 * inch:
-            c.showPage()
-            y = height - 1 * inch
-
-    c.save()
-    buffer.seek(0)
-    return buffer.read()
+@tracing.traced("store.edit")
+def edit_expense(username, expense_id, date, amount, category, description, expected_version=None):
+    store.edit(username, expense_id, date, amount, category, description, expected_version=expected_version)
 
 # ---------------------------
 # UI: Dark mode toggle - simple CSS injection
@@ -159,30 +95,26 @@ def apply_theme(dark: bool):
 # AUTH (Simple)
 # ---------------------------
 
-init_users_file()
+users = init_users_file()
 if "logged_in" not in st.session_state:
     st.session_state["logged_in"] = False
 if "username" not in st.session_state:
     st.session_state["username"] = None
 
 def sign_up(username, password):
-    users = pd.read_csv(USERS_FILE)
-    if username in users["username"].values:
+    pwd_hash = hash_password(password)
+    if not users.create(username, pwd_hash):
         st.error("Username already exists. Please choose another.")
         return False
-    pwd_hash = hash_password(password)
-    users = pd.concat([users, pd.DataFrame([{"username": username, "password_hash": pwd_hash}])], ignore_index=True)
-    users.to_csv(USERS_FILE, index=False)
     init_user_file(username)
     st.success("Signup successful. You can now log in.")
     return True
 
 def log_in(username, password):
-    users = pd.read_csv(USERS_FILE)
-    if username not in users["username"].values:
+    stored_hash = users.password_hash(username)
+    if stored_hash is None:
         st.error("No such user. Please sign up.")
         return False
-    stored_hash = users.loc[users["username"] == username, "password_hash"].iloc[0]
     if hash_password(password) == stored_hash:
         st.session_state["logged_in"] = True
         st.session_state["username"] = username
@@ -245,6 +177,9 @@ if not st.session_state["logged_in"]:
     """)
     st.stop()
 
+from expense_store import ConflictError, row_version
+
+store = get_store()
 username = st.session_state["username"]
 init_user_file(username)
 
@@ -268,52 +203,100 @@ with col1:
             add_expense(username, d, amt, cat, desc)
             st.success(f"Added ₹{amt:.2f} - {cat}")
 
-# Load data and sort by date (newest first)
+    with st.expander("📥 Bulk import (CSV / bank statement)"):
+        st.caption("Needs a date and an amount column. Category and description are optional. Rows already in your ledger are skipped.")
+        statement = st.file_uploader("Statement file", type=["csv"], key="import_file")
+        imp_cat = st.text_input("Category for rows without one", value="General", key="import_category")
+        imp_signed = st.checkbox("Amounts are signed (import only negative amounts, as expenses)", key="import_signed")
+        imp_dayfirst = st.checkbox("Dates are day-first (DD/MM/YYYY)", key="import_dayfirst")
+        if statement is not None and st.button("Import expenses"):
+            from expense_import import import_statement
+            try:
+                result = import_statement(store, username, statement, imp_cat.strip() or "General", imp_signed, imp_dayfirst)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Imported {result.imported} expenses ({result.duplicates} duplicates skipped, {result.invalid} rows without a valid date/amount).")
+
+# Load data (shared cached frame - don't modify it in place)
 df_all = read_user_expenses(username)
-if not df_all.empty:
-    df_all["Date"] = pd.to_datetime(df_all["Date"]).dt.date
-    df_all = df_all.sort_values("Date", ascending=False).reset_index(drop=True)
-else:
-    df_all = pd.DataFrame(columns=["Date", "Amount", "Category", "Description"])
 
-# Filter for selected month/year
-df_all["Date_dt"] = pd.to_datetime(df_all["Date"])
-df_month = df_all[(df_all["Date_dt"].dt.year == int(selected_year)) & (df_all["Date_dt"].dt.month == int(selected_month))].copy()
-df_month = df_month.drop(columns=["Date_dt"])
+# Month totals and category sums come from the maintained rollup, not a scan of df_all
+with tracing.span("store.rollup"):
+    rollup = store.rollup(username)
+month_has_data = rollup.month_count(selected_year, selected_month) > 0
 
-# Show expenses list (auto-sorted)
+# Show expenses list: one page at a time, newest first
 st.subheader("📜 All Expenses (Newest first)")
 if df_all.empty:
     st.info("No expenses yet. Add one above.")
 else:
-    for i, row in df_all.iterrows():
-        with st.expander(f"{row['Date']} | ₹{row['Amount']} - {row['Category']}"):
-            st.write(f"**Description:** {row['Description']}")
-            c1, c2 = st.columns(2)
-            with c1:
-                if st.button(f"✏️ Edit {i}", key=f"edit_{i}"):
-                    with st.form(f"edit_form_{i}"):
-                        new_date = st.date_input("Date", value=pd.to_datetime(row['Date']).date())
-                        new_amount = st.number_input("Amount", value=float(row['Amount']), min_value=0.0, format="%.2f")
-                        new_category = st.text_input("Category", value=row['Category'])
-                        new_description = st.text_area("Description", value=row['Description'])
-                        save = st.form_submit_button("Save")
-                        if save:
-                            edit_expense(username, i, new_date, new_amount, new_category, new_description)
-                            st.success("Saved.")
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+    with f1:
+        date_range = st.date_input("Date range", value=(), key="list_dates")
+    with f2:
+        cat_filter = st.multiselect("Categories", options=rollup.categories(), key="list_cats")
+    with f3:
+        search = st.text_input("Search description", key="list_search")
+    with f4:
+        page_size = st.selectbox("Per page", options=[10, 25, 50, 100], key="list_page_size")
+
+    start, end = (date_range[0], date_range[1]) if len(date_range) == 2 else (None, None)
+    with tracing.span("list.filter", rows=len(df_all)):
+        positions = store.index(username).filter(df_all, start, end, cat_filter, search.strip())
+    total_pages = max(1, -(-len(positions) // page_size))
+    if st.session_state.get("list_page", 1) > total_pages:
+        st.session_state["list_page"] = total_pages
+    page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1, key="list_page")
+
+    first = (int(page) - 1) * page_size
+    page_df = df_all.iloc[positions[first:first + page_size]]
+    if page_df.empty:
+        st.info("No expenses match these filters.")
+    else:
+        st.caption(f"Showing {first + 1}-{first + len(page_df)} of {len(positions)} expenses (page {int(page)} of {total_pages})")
+
+    with tracing.span("list.render", rows=len(page_df)):
+        for _, row in page_df.iterrows():
+            eid = int(row["ID"])
+            row_date = row["Date"].date()
+            # Fingerprint of the values shown here; the store rejects the change if another tab got there first
+            seen = row_version(row["Date"], row["Amount"], row["Category"], row["Description"])
+            with st.expander(f"{row_date} | ₹{row['Amount']} - {row['Category']}"):
+                st.write(f"**Description:** {row['Description']}")
+                c1, c2 = st.columns(2)
+                with c1:
+                    if st.button(f"✏️ Edit {eid}", key=f"edit_{eid}"):
+                        with st.form(f"edit_form_{eid}"):
+                            new_date = st.date_input("Date", value=row_date)
+                            new_amount = st.number_input("Amount", value=float(row['Amount']), min_value=0.0, format="%.2f")
+                            new_category = st.text_input("Category", value=row['Category'])
+                            new_description = st.text_area("Description", value=row['Description'])
+                            save = st.form_submit_button("Save")
+                            if save:
+                                try:
+                                    edit_expense(username, eid, new_date, new_amount, new_category, new_description, expected_version=seen)
+                                except ConflictError as e:
+                                    st.error(str(e))
+                                else:
+                                    st.success("Saved.")
+                                    st.experimental_rerun()
+                with c2:
+                    if st.button(f"🗑️ Delete {eid}", key=f"del_{eid}"):
+                        try:
+                            delete_expense(username, eid, expected_version=seen)
+                        except ConflictError as e:
+                            st.error(str(e))
+                        else:
+                            st.warning("Deleted.")
                             st.experimental_rerun()
-            with c2:
-                if st.button(f"🗑️ Delete {i}", key=f"del_{i}"):
-                    delete_expense(username, i)
-                    st.warning("Deleted.")
-                    st.experimental_rerun()
 
 # Monthly / overall summaries on the right
 st.sidebar.subheader("Quick Summary")
-total_all = df_all["Amount"].sum() if not df_all.empty else 0.0
+total_all = rollup.total
 st.sidebar.write(f"Total expenses (all time): ₹{total_all:.2f}")
 
-total_month = df_month["Amount"].sum() if not df_month.empty else 0.0
+total_month = rollup.month_total(selected_year, selected_month)
 st.sidebar.write(f"Total for {selected_month}/{selected_year}: ₹{total_month:.2f}")
 
 # Savings progress bar for the selected month
@@ -335,33 +318,68 @@ if salary > 0:
 else:
     st.info("Set your monthly salary on the sidebar to see savings progress.")
 
+# Month-end forecast for the current month. The daily-spend arrays are kept
+# with the cached ledger and patched on each change, so this is a few slices.
+today = datetime.now().date()
+if (int(selected_year), int(selected_month)) == (today.year, today.month) and month_has_data:
+    from expense_forecast import DailySpend, budget_alerts, month_forecast
+    with tracing.span("forecast"):
+        daily = store.incremental(username, "daily_spend", DailySpend.from_frame)
+        forecast = month_forecast(daily, selected_year, selected_month, today)
+    st.write(f"🔮 Projected month-end spend: ₹{forecast.projected:.2f} (₹{forecast.spent:.2f} over the first {forecast.elapsed} of {len(forecast.path)} days)")
+    for level, message in budget_alerts(forecast, salary):
+        getattr(st, level)(f"⚠️ {message}" if level == "warning" else message)
+    with st.expander("Forecast by category"):
+        st.dataframe(forecast.categories.round(2), use_container_width=True)
+
 # Category pie chart for the selected month (or all if empty)
 st.subheader("📊 Category Breakdown (Selected month)")
-if df_month.empty:
+if not month_has_data:
     st.info("No expenses in this month to chart.")
 else:
-    cat_sum = df_month.groupby("Category")["Amount"].sum().sort_values(ascending=False)
-    fig, ax = plt.subplots(figsize=(6,4))
-    ax.pie(cat_sum.values, labels=cat_sum.index, autopct="%1.1f%%", startangle=90)
-    ax.axis("equal")
-    st.pyplot(fig)
+    # Rendered once per ledger version and month, then served as cached PNG bytes
+    from charts import cached_chart, pie_png
+    cat_sum = rollup.month_categories(selected_year, selected_month)
+    pie_key = ("category_pie", username, store.version(username), int(selected_year), int(selected_month))
+    with tracing.span("chart.category_pie", rows=len(cat_sum)):
+        st.image(cached_chart(pie_key, lambda: pie_png(cat_sum.values, cat_sum.index)))
 
 # Auto-sort: already sorted when displayed and saved
 
 # PDF Export for selected month
 st.subheader("📄 Monthly Summary PDF")
-if df_month.empty:
+if not month_has_data:
     st.info("No transactions for selected month to generate PDF.")
 else:
-    try:
-        pdf_bytes = create_month_summary_pdf(username, df_month, selected_year, selected_month, salary if salary > 0 else None)
-        b64 = base64.b64encode(pdf_bytes).decode()
+    # Rendered only on request, off the script thread, and cached per ledger version
+    from pdf_report import cached_report, create_month_summary_pdf, request_report
+    report_salary = salary if salary > 0 else None
+    report_key = (username, int(selected_year), int(selected_month), store.version(username), report_salary)
+    pdf_bytes = cached_report(report_key)
+    if pdf_bytes is None and st.button("Prepare PDF Summary"):
+        df_month = month_expenses(username, selected_year, selected_month)
+
+        def build_pdf():
+            # Runs on the report worker thread, so it only shows up in the dumped stats
+            with tracing.span("pdf.build", rows=len(df_month)):
+                return create_month_summary_pdf(username, df_month, selected_year, selected_month, report_salary)
+
+        future = request_report(report_key, build_pdf)
+        try:
+            with tracing.span("pdf.wait"):
+                pdf_bytes = future.result(timeout=PDF_WAIT_SECONDS)
+        except FutureTimeout:
+            st.info("Still rendering the PDF in the background. Click the button again in a moment.")
+        except RuntimeError as e:
+            st.error(str(e))
+            st.write("To enable PDF export, install reportlab: `pip install reportlab`")
+    if pdf_bytes is not None:
         now = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{username}_summary_{selected_year}_{selected_month}_{now}.pdf"
         st.download_button("Download PDF Summary", data=pdf_bytes, file_name=filename, mime="application/pdf")
-    except RuntimeError as e:
-        st.error(str(e))
-        st.write("To enable PDF export, install reportlab: `pip install reportlab`")
+
+if tracing.is_admin(username):
+    tracing.render_panel(st)
 
 # Small footer
 st.markdown("---")
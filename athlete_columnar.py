@@ -0,0 +1,431 @@
+# athlete_columnar.py
+"""
+Out-of-core storage for athlete datasets too large to hold as a DataFrame.
+
+Large uploads are spooled to disk in blocks (hashing as they go), then
+converted chunk by chunk into a directory of raw column files - float32 for
+numbers, int32 codes plus a label list for text - that are opened with
+np.memmap. Nothing ever holds the whole dataset in memory: athlete/event
+lists, per-pair means, injury counts and the comparison table come from
+streamed np.bincount passes over the code columns, and only the rows of the
+athlete being viewed (or the preview page) are materialised as a DataFrame.
+
+The converted directory is named after the content hash, so uploading the
+same file again, or converting it ahead of time on the server, skips the
+work:
+
+    python athlete_columnar.py convert telemetry.csv
+
+Each upload spools and converts into its own temporary names, so concurrent
+sessions never share a work file. The spool keeps the SPOOL_KEEP most
+recently used datasets; older ones (and leftovers of interrupted
+conversions) are removed after each conversion or with
+`python athlete_columnar.py prune`.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from athlete_data import FLOAT_COLUMNS, INT_COLUMNS
+
+SPOOL_DIR = os.environ.get("ATHLETE_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "athlete_spool")
+SPOOL_KEEP = int(os.environ.get("ATHLETE_SPOOL_KEEP", "8"))
+# Spooled uploads and work directories older than this belong to dead sessions.
+STALE_SECONDS = 6 * 3600
+SPOOL_BLOCK_BYTES = 8 * 1024 * 1024
+CONVERT_CHUNK_ROWS = 500_000
+SCAN_CHUNK_ROWS = 4_000_000
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+# ---------------------------
+# Spooling + conversion
+# ---------------------------
+
+def spool(source, directory=SPOOL_DIR):
+    """
+    Copy a file object to a new file in `directory` in blocks; return (csv
+    path, content key). The key is the same blake2b digest
+    athlete_data.content_key gives. The caller removes the file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    h = hashlib.blake2b(digest_size=16)
+    fd, path = tempfile.mkstemp(dir=directory, prefix="upload-", suffix=".csv")
+    with os.fdopen(fd, "wb") as out:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        while True:
+            block = source.read(SPOOL_BLOCK_BYTES)
+            if not block:
+                break
+            h.update(block)
+            out.write(block)
+    return path, h.hexdigest()
+
+
+def _column_kind(name):
+    # Only the known metric columns are numeric. Anything else is stored as
+    # text: guessing from the first rows would turn a column that starts
+    # blank (read as float) into one that fails on its first label.
+    if name in INT_COLUMNS or name in FLOAT_COLUMNS:
+        return "float32"
+    return "category"
+
+
+def file_key(path):
+    """Content key of a file on disk, read in blocks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(SPOOL_BLOCK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def convert_csv(csv_path, out_dir, chunksize=CONVERT_CHUNK_ROWS):
+    """
+    Convert a CSV into column files under `out_dir`; returns the
+    ColumnarDataset. The files are written to a private work directory that
+    is renamed into place, so a concurrent conversion of the same content
+    just finds `out_dir` already there.
+    """
+    parent, name = os.path.split(os.path.abspath(out_dir))
+    work = tempfile.mkdtemp(dir=parent, prefix=name + ".", suffix=".part")
+    try:
+        _write_columns(csv_path, work, chunksize)
+        try:
+            os.rename(work, out_dir)
+        except OSError:
+            # Another session renamed its copy into place first.
+            if not os.path.exists(os.path.join(out_dir, META_FILE)):
+                raise
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return ColumnarDataset(out_dir)
+
+
+def _write_columns(csv_path, work, chunksize):
+    header = pd.read_csv(csv_path, nrows=0)
+    kinds = {name: _column_kind(name) for name in header.columns}
+    dtypes = {name: ("category" if kind == "category" else "float32") for name, kind in kinds.items()}
+    labels = {name: {} for name, kind in kinds.items() if kind == "category"}
+    files = {name: open(os.path.join(work, f"{i}.bin"), "wb") for i, name in enumerate(kinds)}
+    rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=dtypes):
+            for name, kind in kinds.items():
+                col = chunk[name]
+                if kind == "category":
+                    mapping = labels[name]
+                    for label in col.cat.categories:
+                        mapping.setdefault(label, len(mapping))
+                    lookup = np.array([mapping[c] for c in col.cat.categories] + [-1], dtype=np.int32)
+                    # Chunk-local codes (-1 = missing) -> dataset-wide codes.
+                    values = lookup[col.cat.codes.to_numpy()]
+                else:
+                    values = col.to_numpy(dtype=np.float32)
+                files[name].write(np.ascontiguousarray(values).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": rows,
+        "columns": [
+            {"name": name, "kind": kind, "file": f"{i}.bin",
+             "categories": list(labels[name]) if kind == "category" else None}
+            for i, (name, kind) in enumerate(kinds.items())
+        ],
+    }
+    with open(os.path.join(work, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def converted_dir(key, directory=SPOOL_DIR):
+    return os.path.join(directory, key)
+
+
+def open_or_convert(source, directory=SPOOL_DIR):
+    """Spool + convert `source` (file object) unless its columns already exist."""
+    csv_path, key = spool(source, directory)
+    out_dir = converted_dir(key, directory)
+    try:
+        if os.path.exists(os.path.join(out_dir, META_FILE)):
+            ds = ColumnarDataset(out_dir)
+            _touch(out_dir)
+            return ds, key
+        ds = convert_csv(csv_path, out_dir)
+    finally:
+        try:
+            os.remove(csv_path)
+        except FileNotFoundError:
+            pass
+    prune_spool(directory, keep_dir=out_dir)
+    return ds, key
+
+
+def _touch(out_dir):
+    """Mark a converted dataset as recently used, for prune_spool."""
+    try:
+        os.utime(os.path.join(out_dir, META_FILE))
+    except OSError:
+        pass
+
+
+def prune_spool(directory=SPOOL_DIR, keep=SPOOL_KEEP, keep_dir=None):
+    """
+    Remove all but the `keep` most recently used converted datasets in
+    `directory`, plus uploads and work directories older than STALE_SECONDS.
+    Sessions already viewing a removed dataset keep their open memory maps.
+    Returns the number of entries removed.
+    """
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    removed = 0
+    datasets = []
+    for entry in entries:
+        try:
+            if entry.name.endswith(".part") or entry.name.startswith("upload-"):
+                if now - entry.stat().st_mtime > STALE_SECONDS:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.remove(entry.path)
+                    removed += 1
+            elif entry.is_dir() and os.path.abspath(entry.path) != os.path.abspath(keep_dir or ""):
+                datasets.append((os.stat(os.path.join(entry.path, META_FILE)).st_mtime, entry.path))
+        except FileNotFoundError:
+            continue  # removed by another session meanwhile
+    datasets.sort(reverse=True)
+    for _, path in datasets[max(keep - (1 if keep_dir else 0), 0):]:
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+
+class ColumnarDataset:
+    """Memory-mapped view of a converted dataset."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {meta.get('version')}")
+        self.n_rows = meta["rows"]
+        self.columns = [c["name"] for c in meta["columns"]]
+        self.categories = {c["name"]: c["categories"] for c in meta["columns"] if c["kind"] == "category"}
+        self._arrays = {}
+        for c in meta["columns"]:
+            dtype = np.int32 if c["kind"] == "category" else np.float32
+            file = os.path.join(path, c["file"])
+            self._arrays[c["name"]] = (np.memmap(file, dtype=dtype, mode="r", shape=(self.n_rows,))
+                                       if self.n_rows else np.empty(0, dtype=dtype))
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def disk_bytes(self):
+        return sum(a.nbytes for a in self._arrays.values())
+
+    def raw(self, name):
+        """The memory-mapped array behind a column (codes for text columns)."""
+        return self._arrays[name]
+
+    def _frame(self, selector):
+        data = {}
+        for name in self.columns:
+            values = np.asarray(self._arrays[name][selector])
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, categories=self.categories[name])
+            elif name in INT_COLUMNS and len(values) and not np.isnan(values).any():
+                data[name] = values.astype(np.int16)
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
+
+    def slice(self, start, stop):
+        """Rows [start, stop) as a DataFrame (for paged previews)."""
+        return self._frame(slice(start, min(stop, self.n_rows)))
+
+    def take(self, positions):
+        return self._frame(np.asarray(positions, dtype=np.int64))
+
+    def sample(self, n, seed=0):
+        n = min(n, self.n_rows)
+        positions = np.sort(np.random.default_rng(seed).choice(self.n_rows, n, replace=False))
+        return self.take(positions)
+
+    def scan(self, names, chunk_rows=SCAN_CHUNK_ROWS):
+        """Yield (start, {name: array}) chunks of the raw columns."""
+        for start in range(0, self.n_rows, chunk_rows):
+            stop = min(start + chunk_rows, self.n_rows)
+            yield start, {name: np.asarray(self._arrays[name][start:stop]) for name in names}
+
+
+# ---------------------------
+# Streamed aggregates
+# ---------------------------
+
+class OutOfCoreIndex:
+    """
+    The AthleteIndex interface over a ColumnarDataset, built from streamed
+    bincount passes. `athlete_frame` reads one athlete's rows from disk.
+    """
+
+    METRICS = ["HeartRate", "Speed", "Calories", "ReactionTime"]
+
+    def __init__(self, ds):
+        self.ds = ds
+        athlete_labels = ds.categories["Athlete"]
+        event_labels = ds.categories["Event"]
+        injury_labels = ds.categories.get("Injury", [])
+        n_a, n_e = len(athlete_labels), len(event_labels)
+        n_pairs = n_a * n_e
+        metrics = [m for m in self.METRICS if m in ds.columns and m not in ds.categories]
+        counts = np.zeros(n_pairs, dtype=np.int64)
+        first_seen = np.full(n_pairs, np.iinfo(np.int64).max)
+        sums = {m: np.zeros(n_pairs) for m in metrics}
+        valid = {m: np.zeros(n_pairs) for m in metrics}
+        injury_counts = np.zeros(len(injury_labels), dtype=np.int64)
+        injured = np.zeros(n_pairs)
+        severe = np.zeros(n_pairs)
+        no_injury = injury_labels.index("No Injury") if "No Injury" in injury_labels else -2
+        severe_code = injury_labels.index("Severe") if "Severe" in injury_labels else -2
+
+        names = ["Athlete", "Event"] + metrics + (["Injury"] if injury_labels else [])
+        for start, cols in ds.scan(names):
+            a, e = cols["Athlete"], cols["Event"]
+            ok = (a >= 0) & (e >= 0)
+            pair = (a.astype(np.int64) * n_e + e)[ok]
+            counts += np.bincount(pair, minlength=n_pairs)
+            uniq, first = np.unique(pair, return_index=True)
+            first_seen[uniq] = np.minimum(first_seen[uniq], start + np.flatnonzero(ok)[first])
+            for m in metrics:
+                x = cols[m][ok].astype(np.float64)
+                present = ~np.isnan(x)
+                sums[m] += np.bincount(pair, weights=np.where(present, x, 0.0), minlength=n_pairs)
+                valid[m] += np.bincount(pair, weights=present, minlength=n_pairs)
+            if injury_labels:
+                inj = cols["Injury"]
+                injury_counts += np.bincount(inj[inj >= 0], minlength=len(injury_labels))
+                inj = inj[ok]
+                injured += np.bincount(pair, weights=(inj >= 0) & (inj != no_injury), minlength=n_pairs)
+                severe += np.bincount(pair, weights=inj == severe_code, minlength=n_pairs)
+
+        present = np.flatnonzero(counts)
+        self.athlete_codes = {athlete_labels[c]: c for c in np.unique(present // n_e)}
+        self.athletes = sorted(self.athlete_codes)
+        self.events = sorted({event_labels[c] for c in np.unique(present % n_e)})
+        self.athlete_events = {}
+        for p in present[np.argsort(first_seen[present], kind="stable")]:
+            self.athlete_events.setdefault(athlete_labels[p // n_e], []).append(event_labels[p % n_e])
+
+        index = pd.MultiIndex.from_arrays(
+            [[athlete_labels[p // n_e] for p in present], [event_labels[p % n_e] for p in present]],
+            names=["Athlete", "Event"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = {m: sums[m][present] / valid[m][present] for m in metrics}
+        self.pair_means = pd.DataFrame(means, index=index)
+        table = {"Sessions": counts[present]}
+        table.update({f"{m}_mean": v for m, v in means.items()})
+        if injury_labels:
+            table["Injury_Rate"] = injured[present] / counts[present]
+            table["Severe_Rate"] = severe[present] / counts[present]
+        self.comparison = pd.DataFrame(table, index=index)
+
+        series = pd.Series(injury_counts, index=pd.Index(injury_labels, name="Injury"), name="count")
+        self.injury_counts = series[series > 0].sort_values(ascending=False)
+        hr_total = sums["HeartRate"].sum() if "HeartRate" in sums else 0.0
+        hr_count = valid["HeartRate"].sum() if "HeartRate" in valid else 0.0
+        self.avg_heart_rate = hr_total / hr_count if hr_count else float("nan")
+        self._athlete_cache = (None, None)
+
+    def athlete_frame(self, ds, athlete):
+        cached_athlete, frame = self._athlete_cache
+        if cached_athlete != athlete:
+            code = self.athlete_codes[athlete]
+            positions = np.concatenate([start + np.flatnonzero(cols["Athlete"] == code)
+                                        for start, cols in ds.scan(["Athlete"])] or [np.empty(0, dtype=np.int64)])
+            frame = ds.take(positions)
+            self._athlete_cache = (athlete, frame)
+        return frame
+
+    def event_frame(self, ds, athlete, event):
+        frame = self.athlete_frame(ds, athlete)
+        return frame[frame["Event"] == event]
+
+    def event_means(self, athlete, event):
+        return self.pair_means.loc[(athlete, event)]
+
+    def injury_total(self, injury):
+        return int(self.injury_counts.get(injury, 0))
+
+
+class SpooledDataset:
+    """Dataset cache entry for an out-of-core upload (see athlete_data.load_uploaded)."""
+
+    out_of_core = True
+
+    def __init__(self, ds, key, load_seconds):
+        self.df = ds
+        self.key = key
+        self.load_seconds = load_seconds
+        self.index = OutOfCoreIndex(ds)
+        self.comparison = self.index.comparison
+        self.trends = None
+        self.nbytes = int(self.index.comparison.memory_usage(deep=True).sum())  # resident size; columns stay on disk
+
+
+def load_spooled(uploaded_file, key=None, directory=SPOOL_DIR):
+    """Spool, convert (or reopen) and index an upload; returns a SpooledDataset."""
+    start = time.perf_counter()
+    out_dir = converted_dir(key, directory) if key else None
+    if out_dir and os.path.exists(os.path.join(out_dir, META_FILE)):
+        ds = ColumnarDataset(out_dir)
+        _touch(out_dir)
+    else:
+        ds, key = open_or_convert(uploaded_file, directory)
+    return SpooledDataset(ds, key, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an athlete CSV to the out-of-core column format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="convert a CSV into the spool directory")
+    conv.add_argument("csv")
+    conv.add_argument("--spool-dir", default=SPOOL_DIR)
+    prune = sub.add_parser("prune", help="remove all but the most recently used converted datasets")
+    prune.add_argument("--keep", type=int, default=SPOOL_KEEP)
+    prune.add_argument("--spool-dir", default=SPOOL_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "prune":
+        print(f"Removed {prune_spool(args.spool_dir, args.keep)} entries from {args.spool_dir}")
+        return
+    start = time.perf_counter()
+    # Converted in place from the given path; only the column files land in the spool directory.
+    out_dir = converted_dir(file_key(args.csv), args.spool_dir)
+    os.makedirs(args.spool_dir, exist_ok=True)
+    ds = convert_csv(args.csv, out_dir)
+    print(f"{ds.n_rows:,} rows -> {ds.path} ({ds.disk_bytes / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# athlete_compare.py
+"""
+Athlete x event comparison.
+
+`comparison_table` computes, in one grouped pass over the dataset, every
+(athlete, event) pair's session count, mean and percentiles of each metric,
+and injury rates. Rankings and athlete x event pivots are then cheap
+reshapes of that table (a few rows per athlete), so comparing thousands of
+athletes never filters the raw rows athlete by athlete.
+"""
+import numpy as np
+import pandas as pd
+
+COMPARE_METRICS = ["HeartRate", "Speed", "Calories", "ReactionTime"]
+PERCENTILES = (0.5, 0.9)
+# Direction used when ranking: True when a bigger value is better.
+HIGHER_IS_BETTER = {
+    "Speed": True,
+    "Calories": True,
+    "HeartRate": False,
+    "ReactionTime": False,
+    "Injury_Rate": False,
+    "Severe_Rate": False,
+}
+
+
+def _metrics(df):
+    return [m for m in COMPARE_METRICS if m in df.columns]
+
+
+def comparison_table(df, percentiles=PERCENTILES):
+    """
+    One row per (Athlete, Event): Sessions, <metric>_mean, <metric>_p50,
+    <metric>_p90 ..., and Injury_Rate / Severe_Rate when Injury is present.
+    """
+    metrics = _metrics(df)
+    columns = metrics + (["Injury"] if "Injury" in df.columns else [])
+    work = df[["Athlete", "Event"] + columns]
+    if "Injury" in columns:
+        injury = work["Injury"]
+        work = work.assign(
+            Injury_Rate=(injury.notna() & (injury != "No Injury")).astype(np.float32),
+            Severe_Rate=(injury == "Severe").astype(np.float32),
+        ).drop(columns="Injury")
+    grouped = work.groupby(["Athlete", "Event"], observed=True, sort=True)
+
+    table = grouped.size().rename("Sessions").to_frame()
+    means = grouped.mean()
+    means.columns = [c if c.endswith("_Rate") else f"{c}_mean" for c in means.columns]
+    parts = [table, means]
+    if metrics and percentiles:
+        quantiles = grouped[metrics].quantile(list(percentiles)).unstack(-1)
+        quantiles.columns = [f"{m}_p{round(q * 100)}" for m, q in quantiles.columns]
+        parts.append(quantiles)
+    return pd.concat(parts, axis=1)
+
+
+def rank_athletes(table, metric="Speed", events=None):
+    """
+    Per-athlete summary over `events` (all when empty): sessions, the
+    session-weighted mean of every metric, injury rates, and a Rank column
+    ordered by `metric` (see HIGHER_IS_BETTER).
+    """
+    if events:
+        table = table[table.index.get_level_values("Event").isin(events)]
+    value_cols = [c for c in table.columns if c.endswith("_mean") or c.endswith("_Rate")]
+    weights = table["Sessions"].to_numpy(dtype=np.float64)[:, None]
+    weighted = pd.DataFrame(table[value_cols].to_numpy(dtype=np.float64) * weights,
+                            index=table.index, columns=value_cols)
+    weighted["Sessions"] = table["Sessions"]
+    weighted["Events"] = 1
+    totals = weighted.groupby(level="Athlete", observed=True).sum()
+    summary = totals[value_cols].div(totals["Sessions"], axis=0)
+    summary.columns = [c[:-len("_mean")] if c.endswith("_mean") else c for c in summary.columns]
+    summary.insert(0, "Events", totals["Events"])
+    summary.insert(0, "Sessions", totals["Sessions"])
+    ascending = not HIGHER_IS_BETTER.get(metric, True)
+    summary = summary.sort_values(metric, ascending=ascending, kind="stable")
+    summary.insert(0, "Rank", np.arange(1, len(summary) + 1))
+    return summary
+
+
+def event_pivot(table, column, athletes=None, events=None):
+    """Athlete x event grid of one comparison column (e.g. 'Speed_mean')."""
+    grid = table[column].unstack("Event")
+    if athletes is not None:
+        grid = grid.reindex(athletes)
+    if events:
+        grid = grid[[e for e in events if e in grid.columns]]
+    return grid
+
+
+def dataset_comparison(loaded):
+    """Return the comparison table for a LoadedDataset, building it once."""
+    if loaded.comparison is None:
+        loaded.comparison = comparison_table(loaded.df)
+    return loaded.comparison
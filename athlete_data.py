@@ -0,0 +1,216 @@
+# athlete_data.py
+"""
+Dataset loading for the athlete dashboards.
+
+Uploaded CSVs are parsed once, in chunks, into compact dtypes (categorical
+text columns, int16/float32 numbers) and kept in a process-wide LRU keyed by
+a hash of the file contents, so widget changes and new sessions that upload
+the same file skip parsing entirely. Uploads over OUT_OF_CORE_BYTES are
+handed to athlete_columnar instead and stay on disk.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+CHUNK_ROWS = 200_000
+PREVIEW_ROWS = 1000
+OUT_OF_CORE_BYTES = int(os.environ.get("ATHLETE_OUT_OF_CORE_MB", "256")) * 1024 * 1024
+CACHE_BYTES = int(os.environ.get("ATHLETE_CACHE_MB", "1024")) * 1024 * 1024
+
+CATEGORY_COLUMNS = ["Athlete", "Event", "Injury"]
+INT_COLUMNS = ["HeartRate", "Session", "Calories"]
+FLOAT_COLUMNS = ["Speed", "ReactionTime", "Training_Hours", "Age"]
+
+
+class LoadedDataset:
+    out_of_core = False
+
+    def __init__(self, df, key, load_seconds):
+        self.df = df
+        self.key = key
+        self.load_seconds = load_seconds
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        self.index = None  # AthleteIndex, built on first use by dataset_index()
+        self.comparison = None  # athlete x event table, see athlete_compare.dataset_comparison()
+        self.trends = None  # rolling session trends, see athlete_trends.dataset_trends()
+
+
+def content_key(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _read_dtypes(header):
+    dtypes = {}
+    for col in header:
+        if col in CATEGORY_COLUMNS:
+            dtypes[col] = "category"
+        elif col in INT_COLUMNS or col in FLOAT_COLUMNS:
+            # Parse as float32 so missing cells don't fail; ints are narrowed afterwards.
+            dtypes[col] = "float32"
+    return dtypes
+
+
+def _concat_chunks(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            # Sorted like a single read_csv chunk, so Athlete/Event lists stay alphabetical.
+            columns[col] = pd.Series(union_categoricals([c[col] for c in chunks], sort_categories=True))
+        else:
+            columns[col] = pd.concat([c[col] for c in chunks], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def parse_dataset(source, chunksize=CHUNK_ROWS):
+    """Parse a CSV (path or file object) into the compact athlete dtypes."""
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, "seek"):
+        source.seek(0)
+    chunks = list(pd.read_csv(source, chunksize=chunksize, dtype=_read_dtypes(header)))
+    if not chunks:
+        return pd.read_csv(io.StringIO(",".join(header) + "\n"))
+    df = _concat_chunks(chunks)
+    for col in INT_COLUMNS:
+        if col in df.columns and not df[col].isna().any():
+            df[col] = df[col].astype("int16")
+    return df
+
+
+# ---------------------------
+# Drill-down index
+# ---------------------------
+
+METRIC_COLUMNS = ["HeartRate", "Speed", "Calories"]
+
+
+class AthleteIndex:
+    """
+    Everything the dashboard drill-downs need, computed in one pass per
+    dataset: row positions per athlete and per (athlete, event), per-group
+    metric means, and whole-dataset injury counts and heart-rate mean.
+    """
+
+    def __init__(self, df):
+        by_athlete = df.groupby("Athlete", observed=True, sort=True)
+        self.athlete_rows = by_athlete.indices
+        self.athletes = list(self.athlete_rows)
+        self.events = sorted(df["Event"].dropna().unique())
+
+        by_pair = df.groupby(["Athlete", "Event"], observed=True, sort=False)
+        self.pair_rows = by_pair.indices
+        # Events per athlete in order of first appearance, like .unique() gave.
+        first_seen = sorted(self.pair_rows, key=lambda k: self.pair_rows[k][0])
+        self.athlete_events = {}
+        for athlete, event in first_seen:
+            self.athlete_events.setdefault(athlete, []).append(event)
+        metrics = [c for c in METRIC_COLUMNS if c in df.columns]
+        self.pair_means = by_pair[metrics].mean() if metrics else None
+
+        counts = df["Injury"].value_counts()
+        self.injury_counts = counts[counts > 0]
+        self.avg_heart_rate = float(df["HeartRate"].mean()) if "HeartRate" in df.columns else float("nan")
+
+    def athlete_frame(self, df, athlete):
+        return df.iloc[self.athlete_rows[athlete]]
+
+    def event_frame(self, df, athlete, event):
+        return df.iloc[self.pair_rows[(athlete, event)]]
+
+    def event_means(self, athlete, event):
+        return self.pair_means.loc[(athlete, event)]
+
+    def injury_total(self, injury):
+        return int(self.injury_counts.get(injury, 0))
+
+
+def dataset_index(loaded):
+    """Return the AthleteIndex for a LoadedDataset, building it once."""
+    if loaded.index is None:
+        loaded.index = AthleteIndex(loaded.df)
+    return loaded.index
+
+
+class DatasetCache:
+    """Thread-safe LRU of LoadedDataset entries bounded by total bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, entry):
+        with self._lock:
+            old = self._entries.pop(entry.key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+            self._entries[entry.key] = entry
+            self.total_bytes += entry.nbytes
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+
+
+dataset_cache = DatasetCache()
+# Streamlit gives every upload a file_id; remembering its content key lets
+# reruns skip re-hashing the bytes too.
+_upload_keys = OrderedDict()
+MAX_UPLOAD_KEYS = 256
+
+
+def upload_size(uploaded_file):
+    size = getattr(uploaded_file, "size", None)
+    return size if size is not None else len(uploaded_file.getvalue())
+
+
+def _remember_upload(file_id, key):
+    if file_id is not None:
+        _upload_keys[file_id] = key
+        while len(_upload_keys) > MAX_UPLOAD_KEYS:
+            _upload_keys.popitem(last=False)
+
+
+def load_uploaded(uploaded_file):
+    """
+    Return (dataset entry, cache_hit) for a Streamlit UploadedFile (or any
+    object with getvalue()), parsing it only if its contents are new. Large
+    uploads give an out-of-core athlete_columnar.SpooledDataset instead of a
+    LoadedDataset; check `entry.out_of_core`.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    key = _upload_keys.get(file_id) if file_id is not None else None
+    if key is not None:
+        entry = dataset_cache.get(key)
+        if entry is not None:
+            return entry, True
+    if upload_size(uploaded_file) > OUT_OF_CORE_BYTES:
+        from athlete_columnar import load_spooled
+        entry = load_spooled(uploaded_file, key)
+    else:
+        if key is None:
+            key = content_key(uploaded_file.getvalue())
+            _remember_upload(file_id, key)
+            entry = dataset_cache.get(key)
+            if entry is not None:
+                return entry, True
+        start = time.perf_counter()
+        df = parse_dataset(io.BytesIO(uploaded_file.getvalue()))
+        entry = LoadedDataset(df, key, time.perf_counter() - start)
+    _remember_upload(file_id, entry.key)
+    dataset_cache.put(entry)
+    return entry, False
@@ -0,0 +1,153 @@
+# athlete_generator.py
+"""
+Synthetic athlete session data, generated column-at-a-time with NumPy.
+
+Produces the columns dsproject.py has always shown (Athlete, Event, Session,
+HeartRate, Speed, Calories, ReactionTime, Injury) plus the Age and
+Training_Hours features the bundled models use, for
+N athletes x M events x K sessions. Output is reproducible for a given seed
+and chunk size, and can be streamed to CSV or Parquet in chunks so very large
+load-test files never have to fit in memory.
+
+    python athlete_generator.py --athletes 20000 --events 15 --sessions 35 --out season.csv
+    python athlete_generator.py --athletes 1000 --sessions 50 --benchmark
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+ATHLETES = [
+    "Kanmani", "Priya", "Arjun", "Rahul", "Sneha", "Vishal", "Kavin", "Nisha", "Deepak", "Lavanya",
+    "Harini", "Santhosh", "Meena", "Ravi", "Swetha", "Dinesh", "Aarthi", "Vikram", "Gokul", "Divya",
+    "Karthik", "Sanjana", "Bala", "Naveen", "Preethi"
+]
+EVENTS = [
+    "100m Sprint", "200m Sprint", "400m Sprint", "800m Run", "Long Jump", "High Jump",
+    "Shot Put", "Javelin Throw", "Discus Throw", "Marathon", "Relay 4x100m",
+    "Pole Vault", "Triple Jump", "Hammer Throw", "Steeplechase"
+]
+INJURIES = ["No Injury", "Minor", "Moderate", "Severe"]
+
+CHUNK_ROWS = 1_000_000
+
+
+def athlete_names(count):
+    """The built-in names first, then 'Athlete 00026', 'Athlete 00027', ... as needed."""
+    names = ATHLETES[:count]
+    names += [f"Athlete {i:05d}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def event_names(count):
+    names = EVENTS[:count]
+    names += [f"Event {i:03d}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def _as_names(value, default):
+    return default(value) if isinstance(value, (int, np.integer)) else list(value)
+
+
+def iter_chunks(athletes, events, sessions, seed=None, chunk_rows=CHUNK_ROWS):
+    """
+    Yield DataFrames of at most `chunk_rows` rows covering every
+    athlete x event x session combination, in that nesting order.
+
+    `athletes` / `events` are lists of names or counts; `sessions` is the
+    number of sessions per (athlete, event).
+    """
+    athletes = _as_names(athletes, athlete_names)
+    events = _as_names(events, event_names)
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(18, 36, len(athletes), dtype=np.int16)  # one age per athlete, across all chunks
+    athlete_cat = pd.CategoricalDtype(athletes)
+    event_cat = pd.CategoricalDtype(events)
+    injury_cat = pd.CategoricalDtype(INJURIES)
+    per_athlete = len(events) * sessions
+    total = len(athletes) * per_athlete
+
+    for start in range(0, total, chunk_rows):
+        row = np.arange(start, min(start + chunk_rows, total), dtype=np.int64)
+        n = len(row)
+        athlete = row // per_athlete
+        yield pd.DataFrame({
+            "Athlete": pd.Categorical.from_codes(athlete, dtype=athlete_cat),
+            "Event": pd.Categorical.from_codes((row // sessions) % len(events), dtype=event_cat),
+            "Session": (row % sessions + 1).astype(np.int16),
+            "HeartRate": rng.integers(60, 190, n, dtype=np.int16),
+            "Speed": np.round(rng.uniform(5, 28, n), 2).astype(np.float32),
+            "Calories": rng.integers(250, 900, n, dtype=np.int16),
+            "ReactionTime": np.round(rng.uniform(0.2, 1.2, n), 2).astype(np.float32),
+            "Injury": pd.Categorical.from_codes(rng.integers(0, len(INJURIES), n), dtype=injury_cat),
+            "Age": ages[athlete],
+            "Training_Hours": np.round(rng.uniform(1, 12, n), 1).astype(np.float32),
+        })
+
+
+def generate(athletes, events, sessions, seed=None):
+    """Generate the whole dataset in memory as one DataFrame."""
+    chunks = list(iter_chunks(athletes, events, sessions, seed, chunk_rows=CHUNK_ROWS))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_csv(path, athletes, events, sessions, seed=None, chunk_rows=CHUNK_ROWS):
+    """Stream the dataset to a CSV file; returns the number of rows written."""
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_chunks(athletes, events, sessions, seed, chunk_rows):
+            chunk.to_csv(f, index=False, header=rows == 0, float_format="%.2f")
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(path, athletes, events, sessions, seed=None, chunk_rows=CHUNK_ROWS):
+    """Stream the dataset to a Parquet file, one row group per chunk (needs pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except Exception as e:
+        raise RuntimeError("pyarrow not installed. Install via `pip install pyarrow` to write Parquet.") from e
+    rows = 0
+    writer = None
+    try:
+        for chunk in iter_chunks(athletes, events, sessions, seed, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic athlete session data.")
+    parser.add_argument("--athletes", type=int, default=len(ATHLETES))
+    parser.add_argument("--events", type=int, default=len(EVENTS))
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the --out extension")
+    parser.add_argument("--benchmark", action="store_true", help="generate in memory and report rows/second")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.benchmark or not args.out:
+        rows = sum(len(c) for c in iter_chunks(args.athletes, args.events, args.sessions, args.seed, args.chunk_rows))
+    else:
+        fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+        writer = write_parquet if fmt == "parquet" else write_csv
+        rows = writer(args.out, args.athletes, args.events, args.sessions, args.seed, args.chunk_rows)
+    elapsed = time.perf_counter() - start
+    print(f"{rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# athlete_models.py
+"""
+Batch scoring with the bundled models.
+
+speed_model.pkl (LinearRegression) and injury_model.pkl (LogisticRegression)
+both take the features Age and Training_Hours. They are served from their
+coefficient-only exports (speed_model.json / injury_model.json, see
+model_format.py), so scoring needs NumPy only. Each model is loaded once
+per process; a whole DataFrame is scored with one predict call per model, and
+the resulting prediction columns are kept in a small LRU keyed by a hash of
+the feature values (or by a caller-supplied dataset key), so reruns that
+score the same data skip the models entirely.
+
+    python athlete_models.py --rows 1000000
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from model_format import LinearModel
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+SPEED_MODEL_PATH = os.path.join(MODEL_DIR, "speed_model.json")
+INJURY_MODEL_PATH = os.path.join(MODEL_DIR, "injury_model.json")
+
+FEATURES = ["Age", "Training_Hours"]
+PREDICTION_COLUMNS = ["Predicted_Speed", "Injury_Risk"]
+MAX_CACHED_PREDICTIONS = 32
+
+_models = {}
+_models_lock = threading.Lock()
+_predictions = OrderedDict()
+_predictions_lock = threading.Lock()
+
+
+def load_model(path):
+    """Load the exported model at `path` once per process."""
+    model = _models.get(path)
+    if model is None:
+        with _models_lock:
+            model = _models.get(path)
+            if model is None:
+                model = _models[path] = LinearModel.load(path)
+    return model
+
+
+def has_features(df):
+    return all(col in df.columns for col in FEATURES)
+
+
+def feature_key(df):
+    """Hash of the feature columns, used when the caller has no dataset key."""
+    h = hashlib.blake2b(digest_size=16)
+    for col in FEATURES:
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def score(df):
+    """Predict speed and injury probability for every row of `df` in one call per model."""
+    speed = load_model(SPEED_MODEL_PATH).predict(df)
+    injury = load_model(INJURY_MODEL_PATH)
+    risk = injury.predict_proba(df)[:, injury.classes.index(1)]
+    return pd.DataFrame({
+        "Predicted_Speed": np.round(speed, 2).astype(np.float32),
+        "Injury_Risk": np.round(risk, 3).astype(np.float32),
+    }, index=df.index)
+
+
+def predictions(df, key=None):
+    """
+    Cached score(df). Pass `key` (e.g. a dataset content hash) to skip
+    hashing the feature columns.
+    """
+    key = key if key is not None else feature_key(df)
+    with _predictions_lock:
+        cached = _predictions.get(key)
+        if cached is not None:
+            _predictions.move_to_end(key)
+            return cached
+    result = score(df)
+    with _predictions_lock:
+        _predictions[key] = result
+        while len(_predictions) > MAX_CACHED_PREDICTIONS:
+            _predictions.popitem(last=False)
+    return result
+
+
+def with_predictions(df, key=None):
+    """`df` plus the prediction columns, or `df` unchanged if it lacks the features."""
+    if not has_features(df) or df.empty:
+        return df
+    return df.assign(**predictions(df, key))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batch scoring of the bundled models.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    df = pd.DataFrame({
+        "Age": rng.integers(18, 36, args.rows).astype(np.float32),
+        "Training_Hours": np.round(rng.uniform(1, 12, args.rows), 1).astype(np.float32),
+    })
+    start = time.perf_counter()
+    load_model(SPEED_MODEL_PATH)
+    load_model(INJURY_MODEL_PATH)
+    print(f"models loaded in {time.perf_counter() - start:.3f}s")
+    for label in ("cold", "cached"):
+        start = time.perf_counter()
+        predictions(df)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {args.rows:,} rows in {elapsed:.3f}s ({args.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
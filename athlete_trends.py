@@ -0,0 +1,254 @@
+# athlete_trends.py
+"""
+Rolling session trends for Smart Insights.
+
+Each athlete's sessions in an event form one timeline, ordered by Session.
+`compute_trends` adds, for HeartRate and Speed, the rolling mean and standard
+deviation over the last WINDOW sessions, and a z-score of each session
+against the WINDOW sessions before it (anomalies are |z| >= Z_THRESHOLD).
+It also adds the length of the current run of sessions with HeartRate above
+HIGH_HEART_RATE (overtraining once the run reaches OVERTRAINING_SESSIONS).
+
+Everything is computed over all timelines at once from within-group cumulative
+sums. Missing readings are skipped: the windows and baselines average the
+sessions that have a value, like pandas' rolling with min_periods=1, and a
+session without one gets no z-score. TrendTracker keeps just enough of each
+timeline's tail to extend the results when new sessions are appended,
+without recomputing the history.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+TREND_METRICS = ["HeartRate", "Speed"]
+WINDOW = 5
+MIN_PERIODS = 3
+Z_THRESHOLD = 2.5
+HIGH_HEART_RATE = 160
+OVERTRAINING_SESSIONS = 3
+GROUP_COLUMNS = ["Athlete", "Event"]
+
+
+def _group_starts(df):
+    """Boolean array marking the first row of each (athlete, event) run in sorted `df`."""
+    starts = np.zeros(len(df), dtype=bool)
+    if len(df):
+        starts[0] = True
+        for col in GROUP_COLUMNS:
+            column = df[col]
+            # Compare category codes rather than materialising the labels.
+            values = column.cat.codes.to_numpy() if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+            starts[1:] |= values[1:] != values[:-1]
+    return starts
+
+
+def _window_sums(values, starts, window):
+    """
+    Sum, sum of squares and count of the non-missing values among the last
+    `window` rows within each group. Missing values are summed as zero and
+    left out of the count, so a gap doesn't poison the cumulative sums.
+    """
+    n = len(values)
+    idx = np.arange(n)
+    group_start = np.maximum.accumulate(np.where(starts, idx, 0))
+    lo = np.maximum(idx - window + 1, group_start)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    def rolling(x):
+        cs = np.concatenate([[0.0], np.cumsum(x)])
+        return cs[idx + 1] - cs[lo]
+
+    return rolling(filled), rolling(filled * filled), rolling(valid.astype(np.float64))
+
+
+def _mean_std(total, squares, count):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        var = (squares - total * mean) / (count - 1)
+        std = np.sqrt(np.maximum(var, 0.0))
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def sort_sessions(df):
+    return df.sort_values(GROUP_COLUMNS + ["Session"], kind="stable")
+
+
+def compute_trends(df, window=WINDOW):
+    """
+    Return `df` sorted by athlete, event and session with the trend columns
+    <metric>_roll_mean, <metric>_roll_std, <metric>_z, <metric>_anomaly,
+    HighHR_Streak and Overtraining added.
+    """
+    df = sort_sessions(df).reset_index(drop=True)
+    starts = _group_starts(df)
+    idx = np.arange(len(df))
+    columns = {}
+    for metric in TREND_METRICS:
+        if metric not in df.columns:
+            continue
+        x = df[metric].to_numpy(dtype=np.float64)
+        total, squares, count = _window_sums(x, starts, window)
+        mean, std = _mean_std(total, squares, count)
+        # Baseline for the z-score: the `window` sessions before this one.
+        prev_total, prev_squares, prev_count = _window_sums(x, starts, window + 1)
+        valid = ~np.isnan(x)
+        filled = np.where(valid, x, 0.0)
+        prev_total, prev_squares, prev_count = prev_total - filled, prev_squares - filled * filled, prev_count - valid
+        prev_mean, prev_std = _mean_std(prev_total, prev_squares, prev_count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (x - prev_mean) / prev_std
+        z[(prev_count < MIN_PERIODS) | ~np.isfinite(z)] = np.nan
+        columns[f"{metric}_roll_mean"] = mean.astype(np.float32)
+        columns[f"{metric}_roll_std"] = std.astype(np.float32)
+        columns[f"{metric}_z"] = z.astype(np.float32)
+        columns[f"{metric}_anomaly"] = np.abs(np.nan_to_num(z)) >= Z_THRESHOLD
+    if "HeartRate" in df.columns:
+        high = df["HeartRate"].to_numpy(dtype=np.float64) > HIGH_HEART_RATE
+        # A group start behaves as if the row before it broke the run.
+        resets = np.where(~high, idx, np.where(starts, idx - 1, -1))
+        streak = np.where(high, idx - np.maximum.accumulate(resets), 0) if len(df) else idx
+        columns["HighHR_Streak"] = streak.astype(np.int32)
+        columns["Overtraining"] = streak >= OVERTRAINING_SESSIONS
+    return df.assign(**columns)
+
+
+def trend_insights(trends, athlete):
+    """Plain-language findings for one athlete, most serious first."""
+    rows = trends[trends["Athlete"] == athlete]
+    insights = []
+    if "Overtraining" in rows.columns and rows["Overtraining"].any():
+        worst = rows.loc[rows["HighHR_Streak"].idxmax()]
+        insights.append(("error", f"Overtraining: {int(worst['HighHR_Streak'])} consecutive {worst['Event']} sessions "
+                                  f"above {HIGH_HEART_RATE} bpm (up to session {int(worst['Session'])})."))
+    for metric, label in (("HeartRate", "heart rate"), ("Speed", "speed")):
+        flag = f"{metric}_anomaly"
+        if flag in rows.columns and rows[flag].any():
+            hits = rows[rows[flag]]
+            events = ", ".join(sorted(hits["Event"].astype(str).unique())[:3])
+            insights.append(("warning", f"{len(hits)} session(s) with unusual {label} (|z| ≥ {Z_THRESHOLD}) in {events}."))
+    if "Speed_roll_mean" in rows.columns and len(rows):
+        last = rows.groupby("Event", observed=True)["Speed_roll_mean"].last()
+        first = rows.groupby("Event", observed=True)["Speed"].first()
+        change = (last - first) / first
+        falling = change[change <= -0.15]
+        if len(falling):
+            insights.append(("warning", f"Speed trending down in {', '.join(map(str, falling.index[:3]))} "
+                                        f"({falling.min():.0%} vs. first session)."))
+    return insights
+
+
+def dataset_trends(loaded):
+    """Return the trend frame for a LoadedDataset, computing it once."""
+    if loaded.trends is None:
+        loaded.trends = compute_trends(loaded.df)
+    return loaded.trends
+
+
+class TrendTracker:
+    """
+    Trend columns for a growing session history. `append(new_rows)` scores
+    only the new sessions, using each timeline's retained tail as context.
+    New sessions must come after the existing ones in their timeline.
+    `trends` holds the history in append order.
+    """
+
+    def __init__(self, df=None, window=WINDOW):
+        self.window = window
+        self._reset(df)
+
+    def _reset(self, df):
+        """Start the history over from `df` (or empty, if None)."""
+        self.trends = compute_trends(df, self.window) if df is not None else None
+        self._tail = self._tails(self.trends) if df is not None else None
+
+    def _tails(self, trends):
+        """
+        Per timeline, the last `window` rows (z-score baseline) or, if longer,
+        the current high-HR run plus the row before it (streak length).
+        """
+        trends = sort_sessions(trends).reset_index(drop=True)
+        starts = _group_starts(trends)
+        first = np.flatnonzero(starts)
+        group = np.cumsum(starts) - 1
+        size = np.diff(np.r_[first, len(trends)])
+        from_end = size[group] - (np.arange(len(trends)) - first[group]) - 1
+        keep = np.full(len(size), self.window)
+        if "HighHR_Streak" in trends.columns:
+            last_streak = trends["HighHR_Streak"].to_numpy()[first + size - 1]
+            keep = np.maximum(keep, last_streak + 1)
+        return trends[from_end < keep[group]]
+
+    def append(self, new_rows):
+        """Score `new_rows`, add them to the history and return their trend rows."""
+        if self.trends is None:
+            self._reset(new_rows)
+            return self.trends
+        base = [c for c in new_rows.columns if c in self._tail.columns]
+        context = pd.concat([self._tail[base], new_rows[base]], ignore_index=True)
+        marker = np.r_[np.zeros(len(self._tail), dtype=bool), np.ones(len(new_rows), dtype=bool)]
+        scored = compute_trends(context.assign(_new=marker), self.window)
+        fresh = scored[scored["_new"]].drop(columns="_new").reset_index(drop=True)
+        # History stays in append order; within a timeline that is session order.
+        self.trends = pd.concat([self.trends, fresh], ignore_index=True)
+        self._tail = self._tails(pd.concat([self._tail, fresh], ignore_index=True))
+        return fresh
+
+
+def _trend_columns(trends):
+    return [c for c in trends.columns if c.endswith(("_roll_mean", "_roll_std", "_z", "_anomaly")) or
+            c in ("HighHR_Streak", "Overtraining")]
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check rolling trends against pandas groupby().rolling(), and TrendTracker against compute_trends.")
+    parser.add_argument("--athletes", type=int, default=50)
+    parser.add_argument("--events", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--missing", type=float, default=0.1, help="fraction of readings blanked out")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batches", type=int, default=7, help="session batches appended to the TrendTracker")
+    args = parser.parse_args(argv)
+
+    from athlete_generator import generate
+    df = generate(args.athletes, args.events, args.sessions, args.seed)
+    rng = np.random.default_rng(args.seed)
+    for metric in TREND_METRICS:
+        df.loc[rng.random(len(df)) < args.missing, metric] = np.nan
+    trends = compute_trends(df)
+    grouped = trends.groupby(GROUP_COLUMNS, observed=True, sort=False)
+    worst = 0.0
+    for metric in TREND_METRICS:
+        rolling = grouped[metric].rolling(WINDOW, min_periods=1)
+        for column, expected in ((f"{metric}_roll_mean", rolling.mean()), (f"{metric}_roll_std", rolling.std())):
+            expected = expected.reset_index(level=GROUP_COLUMNS, drop=True).sort_index().to_numpy()
+            actual = trends[column].to_numpy(dtype=np.float64)
+            if not np.array_equal(np.isnan(actual), np.isnan(expected)):
+                raise SystemExit(f"{column}: missing values differ from pandas")
+            worst = max(worst, float(np.nanmax(np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0))))
+    print(f"{len(trends):,} rows, {args.missing:.0%} missing: max relative difference {worst:.2e}")
+    if worst > 1e-4:
+        raise SystemExit("rolling trends differ from pandas")
+
+    # Appending sessions in batches must give what one compute_trends over everything gives.
+    tracker = TrendTracker()
+    batch = np.minimum(df["Session"].to_numpy() * args.batches // (args.sessions + 1), args.batches - 1)
+    for b in range(args.batches):
+        tracker.append(df[batch == b])
+    tracked = sort_sessions(tracker.trends).reset_index(drop=True)
+    for column in _trend_columns(trends):
+        actual, expected = tracked[column].to_numpy(dtype=np.float64), trends[column].to_numpy(dtype=np.float64)
+        if not np.allclose(actual, expected, rtol=1e-5, atol=1e-5, equal_nan=True):
+            raise SystemExit(f"TrendTracker {column} differs from compute_trends")
+    print(f"TrendTracker over {args.batches} appended batches matches compute_trends")
+
+
+if __name__ == "__main__":
+    main()
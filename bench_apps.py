@@ -0,0 +1,354 @@
+# bench_apps.py
+"""
+Headless rerun benchmarks for the four Streamlit scripts.
+
+Each (script, size) scenario runs in its own subprocess against generated
+data in a scratch directory: expense ledgers for app.py and miniproject.py
+(in the EXPENSE_BACKEND store), an uploaded athlete CSV for datascience.py (dsproject.py
+generates its own fixed-size roster, so it runs once). The script is driven
+with Streamlit's AppTest through steps such as login, add expense, month
+switch, PDF export and athlete selection, and every step records wall time,
+peak RSS and bytes written. Results go to a JSON report; with --baseline the
+run is compared against an earlier report. The exit status is 1 when a step
+raised or timed out, or got slower than --threshold.
+
+    python bench_apps.py --sizes 1k,100k --out bench.json
+    python bench_apps.py --sizes 1k,100k --baseline bench.json --threshold 0.25
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = ["app", "miniproject", "datascience", "dsproject"]
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+STEP_TIMEOUT = 600
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench"
+CATEGORIES = ["Food", "Travel", "Rent", "Bills", "Shopping", "Health", "Fun"]
+
+
+# ---------------------------
+# Data
+# ---------------------------
+
+def expense_rows(n, seed=0):
+    """`n` expenses spread over the last three years, newest in the current month."""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(dt.date.today(), "D")
+    days = today - rng.integers(0, 3 * 365, n)
+    return pd.DataFrame({
+        "Date": pd.to_datetime(np.sort(days)),
+        "Amount": np.round(rng.uniform(10, 5000, n), 2),
+        "Category": np.asarray(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n)],
+        "Description": [f"expense {i}" for i in range(n)],
+    })
+
+
+def prepare(script, n, workdir):
+    """Create the data `script` reads in `workdir`; returns upload bytes for datascience."""
+    sys.path.insert(0, ROOT)
+    if script == "app":
+        from expense_backends import open_store
+        from user_store import UserStore
+        UserStore(os.path.join(workdir, "users.db")).create(
+            BENCH_USER, hashlib.sha256(BENCH_PASSWORD.encode("utf-8")).hexdigest())
+        open_store(os.path.join(workdir, "user_data")).save(BENCH_USER, expense_rows(n))
+    elif script == "miniproject":
+        # miniproject.py's single ledger
+        from expense_backends import open_store
+        open_store(os.path.join(workdir, "expense_data")).save("default", expense_rows(n))
+    elif script == "datascience":
+        from athlete_generator import write_csv
+        sessions = 10
+        path = os.path.join(workdir, "upload.csv")
+        write_csv(path, max(1, n // (15 * sessions)), 15, sessions, seed=0)
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+# ---------------------------
+# Steps
+# ---------------------------
+
+def _by_label(widgets, label):
+    for w in widgets:
+        if w.label == label:
+            return w
+    raise LookupError(f"no widget labelled {label!r}")
+
+
+def _last_option(widget):
+    return widget.select(widget.options[-1])
+
+
+def steps(script, at):
+    """(name, action) pairs; each action leaves a pending interaction and is followed by at.run()."""
+    if script == "app":
+        def sign_up():
+            # Sign-up runs before the login gate, where the ledger store isn't loaded yet
+            at.text_input(key="su_user").input(BENCH_USER + "_new")
+            at.text_input(key="su_pass").input(BENCH_PASSWORD)
+            _by_label(at.button, "Sign up").click()
+
+        def login():
+            at.text_input(key="login_user").input(BENCH_USER)
+            at.text_input(key="login_pass").input(BENCH_PASSWORD)
+            _by_label(at.button, "Login").click()
+
+        def add_expense():
+            _by_label(at.number_input, "Amount (₹)").set_value(123.45)
+            _by_label(at.text_input, "Category").set_value("Bench")
+            _by_label(at.button, "Add Expense").click()
+
+        def month_switch():
+            month = _by_label(at.selectbox, "Month")
+            month.select(12 if month.value == 1 else month.value - 1)
+
+        return [
+            ("first_run", lambda: None),
+            ("sign_up", sign_up),
+            ("login", login),
+            ("dashboard", lambda: None),
+            ("add_expense", add_expense),
+            ("month_switch", month_switch),
+            ("pdf_export", lambda: _by_label(at.button, "Prepare PDF Summary").click()),
+            ("rerun", lambda: None),
+        ]
+    if script == "miniproject":
+        def add_expense():
+            _by_label(at.number_input, "Amount").set_value(123.45)
+            _by_label(at.text_input, "Category").set_value("Bench")
+            _by_label(at.button, "Add Expense").click()
+
+        return [("first_run", lambda: None), ("add_expense", add_expense), ("rerun", lambda: None)]
+    if script == "datascience":
+        return [
+            ("upload", lambda: None),
+            ("athlete_select", lambda: _last_option(_by_label(at.selectbox, "Select Athlete:"))),
+            ("event_select", lambda: _last_option(_by_label(at.selectbox, "Select Event to Analyze:"))),
+            ("rerun", lambda: None),
+        ]
+    if script == "dsproject":
+        return [
+            ("first_run", lambda: None),
+            ("athlete_select", lambda: _last_option(_by_label(at.selectbox, "Select Athlete:"))),
+            ("event_select", lambda: _last_option(_by_label(at.selectbox, "Select an Event to Analyze:"))),
+            ("seed_change", lambda: _by_label(at.number_input, "Dataset seed:").set_value(7)),
+        ]
+    raise ValueError(script)
+
+
+def _written_bytes():
+    """Bytes this process has written so far (Linux /proc), or None."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+UPLOAD_WRAPPER = '''
+import io, sys
+sys.path.insert(0, {root!r})
+from streamlit.delta_generator import DeltaGenerator
+
+class _Upload(io.BytesIO):
+    file_id = "bench-upload"
+    name = "upload.csv"
+
+_data = open({path!r}, "rb").read()
+DeltaGenerator.file_uploader = lambda self, *a, **k: _Upload(_data)
+__file__ = {script!r}
+exec(compile(open({script!r}, encoding="utf-8").read(), {script!r}, "exec"))
+'''
+
+
+def run_scenario(script, size):
+    """Worker: run one scenario in this process and return its step records."""
+    from streamlit.testing.v1 import AppTest
+
+    n = SIZES[size]
+    workdir = tempfile.mkdtemp(prefix=f"bench-{script}-")
+    try:
+        prepare(script, n, workdir)
+        os.chdir(workdir)
+        path = os.path.join(ROOT, f"{script}.py")
+        if script == "datascience":
+            at = AppTest.from_string(UPLOAD_WRAPPER.format(
+                root=ROOT, path=os.path.join(workdir, "upload.csv"), script=path), default_timeout=STEP_TIMEOUT)
+        else:
+            at = AppTest.from_file(path, default_timeout=STEP_TIMEOUT)
+
+        records = []
+        for name, action in steps(script, at):
+            record = {"script": script, "size": size, "rows": n, "step": name}
+            try:
+                action()
+            except LookupError as e:
+                records.append(dict(record, status="skipped", error=str(e)))
+                continue
+            disk_before, io_before, rss_before = _dir_bytes(workdir), _written_bytes(), _peak_rss_mb()
+            start = time.perf_counter()
+            try:
+                at.run()
+                status = "error" if at.exception else "ok"
+            except RuntimeError as e:  # AppTest raises on timeout
+                status, at_error = "timeout", str(e)
+            seconds = time.perf_counter() - start
+            io_after = _written_bytes()
+            record.update(
+                status=status,
+                seconds=round(seconds, 4),
+                peak_rss_mb=round(_peak_rss_mb(), 1),
+                rss_growth_mb=round(_peak_rss_mb() - rss_before, 1),
+                bytes_written=(io_after - io_before) if io_before is not None else max(0, _dir_bytes(workdir) - disk_before),
+            )
+            if status == "error":
+                record["error"] = str(at.exception[0].value)[:200]
+            elif status == "timeout":
+                record["error"] = at_error[:200]
+            records.append(record)
+            if status == "timeout":
+                break
+        return records
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------------------------
+# Driver
+# ---------------------------
+
+def scenarios(scripts, sizes):
+    for script in scripts:
+        # dsproject has no data-size knob, so it runs once.
+        for size in (sizes[:1] if script == "dsproject" else sizes):
+            yield script, size
+
+
+def collect(scripts, sizes, repeat):
+    results = []
+    for script, size in scenarios(scripts, sizes):
+        runs = []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", script, size],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                runs.append([{"script": script, "size": size, "step": "worker", "status": "error",
+                              "error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1][:200]}])
+                break
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        # Keep the fastest run of each step (least disturbed by noise).
+        best = {}
+        for run in runs:
+            for record in run:
+                key = record["step"]
+                if key not in best or record.get("seconds", float("inf")) < best[key].get("seconds", float("inf")):
+                    best[key] = record
+        for record in best.values():
+            results.append(record)
+            secs = f"{record['seconds']:8.3f}s" if "seconds" in record else "        -"
+            print(f"{script:12} {size:5} {record['step']:15} {secs} {record.get('peak_rss_mb', '-'):>8} MB  {record['status']}",
+                  file=sys.stderr)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Attach baseline timings; return the records that regressed by more than `threshold`."""
+    previous = {(r["script"], r["size"], r["step"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for record in results:
+        old = previous.get((record["script"], record["size"], record["step"]))
+        if not old or "seconds" not in old or "seconds" not in record:
+            continue
+        record["baseline_seconds"] = old["seconds"]
+        record["change"] = round(record["seconds"] / old["seconds"] - 1, 3) if old["seconds"] else None
+        if record["change"] is not None and record["change"] > threshold:
+            regressions.append(record)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Streamlit reruns headlessly.")
+    parser.add_argument("--scripts", default=",".join(SCRIPTS))
+    parser.add_argument("--sizes", default="1k,100k,1M", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--worker", nargs=2, metavar=("SCRIPT", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scenario(*args.worker)))
+        return 0
+
+    scripts = [s for s in args.scripts.split(",") if s]
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in scripts if s not in SCRIPTS] + [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown script/size: {', '.join(unknown)}")
+
+    results = collect(scripts, sizes, args.repeat)
+    report = {
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    failed = [r for r in results if r["status"] in ("error", "timeout")]
+    for r in failed:
+        print(f"FAILED {r['script']} {r['size']} {r['step']}: {r.get('error', r['status'])}", file=sys.stderr)
+    status = 1 if failed else 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["baseline"] = args.baseline
+        report["regressions"] = [(r["script"], r["size"], r["step"], r["change"]) for r in regressions]
+        for r in regressions:
+            print(f"REGRESSION {r['script']} {r['size']} {r['step']}: {r['baseline_seconds']:.3f}s -> {r['seconds']:.3f}s "
+                  f"({r['change']:+.0%})", file=sys.stderr)
+        status = 1 if regressions or failed else 0
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
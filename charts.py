@@ -0,0 +1,110 @@
+# charts.py
+"""
+Chart building shared by the dashboards.
+
+Rows are aggregated before plotting (one point per session, one slice per
+category), and the finished figure is kept in a process-wide LRU keyed by
+whatever identifies the data and filters behind it (dataset key or ledger
+version, athlete, event, month ...). A rerun that doesn't change the data
+reuses the figure instead of rebuilding it. matplotlib charts are drawn on
+a standalone Figure and stored as PNG bytes, so no pyplot figures pile up.
+Plotting libraries are imported on first use.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+MAX_CACHED_CHARTS = 256
+
+
+class ChartCache:
+    """Thread-safe LRU of rendered charts."""
+
+    def __init__(self, max_entries=MAX_CACHED_CHARTS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        chart = build()
+        with self._lock:
+            self._entries[key] = chart
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return chart
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+chart_cache = ChartCache()
+
+
+def cached_chart(key, build):
+    """Return the chart for `key`, calling `build()` only the first time."""
+    return chart_cache.get_or_build(key, build)
+
+
+# ---------------------------
+# Aggregation
+# ---------------------------
+
+def session_means(df, column):
+    """Mean of `column` per Session, sorted by session."""
+    return df.groupby("Session", observed=True, sort=True)[column].mean().reset_index()
+
+
+def count_frame(counts, label):
+    """Turn a value_counts-style Series into a two-column frame, dropping zero counts."""
+    counts = counts[counts > 0]
+    return counts.rename_axis(label).reset_index(name="Count")
+
+
+# ---------------------------
+# Renderers
+# ---------------------------
+
+def pie_png(values, labels, figsize=(6, 4)):
+    """Render a percentage pie chart to PNG bytes."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90)
+    ax.axis("equal")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def session_line(df, column, title):
+    import plotly.express as px
+    return px.line(session_means(df, column), x="Session", y=column, title=title, markers=True)
+
+
+def session_bar(df, column, title):
+    import plotly.express as px
+    return px.bar(session_means(df, column), x="Session", y=column, title=title,
+                  color=column, color_continuous_scale="Viridis")
+
+
+def injury_pie(counts, title, sequential=None):
+    """Pie of injury counts; `sequential` names a px.colors.sequential palette."""
+    import plotly.express as px
+    colors = getattr(px.colors.sequential, sequential) if sequential else None
+    return px.pie(count_frame(counts, "Injury Type"), values="Count", names="Injury Type",
+                  title=title, color_discrete_sequence=colors)
+
+
+def heatmap(grid, title, scale="Viridis"):
+    """Athlete x event heatmap of a pivoted comparison column."""
+    import plotly.express as px
+    return px.imshow(grid, title=title, aspect="auto", color_continuous_scale=scale,
+                     labels={"x": "Event", "y": "Athlete", "color": title})
@@ -1,6 +1,4 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 st.set_page_config(page_title="Athlete Dashboard", layout="wide", page_icon="🏃‍♂️")
 st.markdown("""
 <style>
@@ -29,46 +27,82 @@ st.markdown("""
 st.sidebar.header("Upload Dataset")
 dataset_file = st.sidebar.file_uploader("Upload CSV file", type=["csv"])
 if dataset_file:
-    df = pd.read_csv(dataset_file)
+    # Data and charting libraries load only once there is something to show
+    from athlete_data import PREVIEW_ROWS, dataset_index, load_uploaded
+    from athlete_models import with_predictions
+    # Parsed once per distinct file (content hash) and shared across reruns and sessions
+    loaded, cache_hit = load_uploaded(dataset_file)
     st.success("Dataset Loaded Successfully!")
-    st.dataframe(df, use_container_width=True)
-    athletes = sorted(df["Athlete"].unique())
-    events = sorted(df["Event"].unique())
+    if loaded.out_of_core:
+        # Large upload: columns stay memory-mapped on disk, only a page or sample is read
+        df = loaded.df
+        st.caption(f"{len(df):,} rows · out-of-core ({df.disk_bytes / 1e6:.1f} MB on disk) · prepared in {loaded.load_seconds:.2f}s" + (" (cached)" if cache_hit else ""))
+        colV, colP = st.columns([1, 1])
+        preview_mode = colV.radio("Preview:", ["Page", "Random sample"], horizontal=True)
+        if preview_mode == "Page":
+            pages = max(1, -(-len(df) // PREVIEW_ROWS))
+            page = int(colP.number_input(f"Page (of {pages:,}):", min_value=1, max_value=pages, value=1))
+            st.dataframe(df.slice((page - 1) * PREVIEW_ROWS, page * PREVIEW_ROWS), use_container_width=True)
+        else:
+            st.dataframe(df.sample(PREVIEW_ROWS), use_container_width=True)
+    else:
+        # Predicted_Speed / Injury_Risk columns when the dataset has Age and Training_Hours
+        df = with_predictions(loaded.df, key=loaded.key)
+        st.caption(f"{len(df):,} rows · {loaded.nbytes / 1e6:.1f} MB in memory · parsed in {loaded.load_seconds:.2f}s" + (" (cached)" if cache_hit else ""))
+        st.dataframe(df.head(PREVIEW_ROWS), use_container_width=True)
+        if len(df) > PREVIEW_ROWS:
+            st.caption(f"Showing the first {PREVIEW_ROWS:,} rows.")
+    # Group positions and means are computed once per dataset, not per click
+    index = dataset_index(loaded)
+    athletes = index.athletes
+    events = index.events
     selected_athlete = st.selectbox("Select Athlete:", athletes)
-    athlete_df = df[df["Athlete"] == selected_athlete]
+    athlete_df = index.athlete_frame(df, selected_athlete)
+    if loaded.out_of_core:
+        athlete_df = with_predictions(athlete_df)
     st.markdown(f"Performance Data for **{selected_athlete}**")
     st.dataframe(athlete_df, use_container_width=True)
-    selected_event = st.selectbox("Select Event to Analyze:", athlete_df["Event"].unique())
-    event_df = athlete_df[athlete_df["Event"] == selected_event]
+    if "Injury_Risk" in athlete_df.columns:
+        colP, colR = st.columns(2)
+        colP.metric("Predicted Speed", f"{athlete_df['Predicted_Speed'].mean():.1f} km/h")
+        colR.metric("Predicted Injury Risk", f"{athlete_df['Injury_Risk'].mean():.0%}")
+    selected_event = st.selectbox("Select Event to Analyze:", index.athlete_events[selected_athlete])
+    event_df = athlete_df[athlete_df["Event"] == selected_event] if loaded.out_of_core else index.event_frame(df, selected_athlete, selected_event)
+    event_means = index.event_means(selected_athlete, selected_event)
     # -------- METRICS --------
     col1, col2, col3 = st.columns(3)
-    col1.metric("Avg Heart Rate", f"{event_df['HeartRate'].mean():.1f} bpm")
-    col2.metric("Avg Speed", f"{event_df['Speed'].mean():.1f} km/h")
-    col3.metric("Avg Calories", f"{event_df['Calories'].mean():.1f}")
+    col1.metric("Avg Heart Rate", f"{event_means['HeartRate']:.1f} bpm")
+    col2.metric("Avg Speed", f"{event_means['Speed']:.1f} km/h")
+    col3.metric("Avg Calories", f"{event_means['Calories']:.1f}")
     # -------- CHARTS --------
+    # Built from per-session means and cached per (dataset, athlete, event)
+    from charts import cached_chart, injury_pie, session_bar, session_line
+    chart_key = (loaded.key, selected_athlete, selected_event)
     colA, colB = st.columns(2)
     with colA:
-        fig1 = px.line(event_df, x="Session", y="HeartRate",
-                       title=f"Heart Rate Trend - {selected_event}", markers=True)
+        fig1 = cached_chart(chart_key + ("heart_rate",), lambda: session_line(
+            event_df, "HeartRate", f"Heart Rate Trend - {selected_event}"))
         st.plotly_chart(fig1, use_container_width=True)
 
     with colB:
-        fig2 = px.bar(event_df, x="Session", y="Speed",
-                      title=f"Speed per Session - {selected_event}",
-                      color="Speed", color_continuous_scale="Viridis")
+        fig2 = cached_chart(chart_key + ("speed",), lambda: session_bar(
+            event_df, "Speed", f"Speed per Session - {selected_event}"))
         st.plotly_chart(fig2, use_container_width=True)
     # -------- INJURY REPORT --------
     st.markdown("Injury Report (All Events)")
-    injury_count = df["Injury"].value_counts().reset_index()
-    injury_count.columns = ["Injury Type", "Count"]
-    fig3 = px.pie(injury_count, values="Count", names="Injury Type",
-                  title="Overall Injury Distribution")
+    fig3 = cached_chart((loaded.key, "injuries"), lambda: injury_pie(
+        index.injury_counts, "Overall Injury Distribution"))
     st.plotly_chart(fig3, use_container_width=True)
     # -------- SMART INSIGHTS --------
     st.markdown("Smart Insights")
-    avg_hr = df["HeartRate"].mean()
-    severe_cases = (df["Injury"] == "Severe").sum()
-    minor_cases = (df["Injury"] == "Minor").sum()
+    # Per-athlete rolling trends first (computed once per dataset), then dataset-wide checks
+    from athlete_trends import compute_trends, dataset_trends, trend_insights
+    trends = compute_trends(athlete_df) if loaded.out_of_core else dataset_trends(loaded)
+    for level, message in trend_insights(trends, selected_athlete):
+        getattr(st, level)(f"⚠ {message}")
+    avg_hr = index.avg_heart_rate
+    severe_cases = index.injury_total("Severe")
+    minor_cases = index.injury_total("Minor")
     if severe_cases > 0:
         st.error("⚠ Severe injuries detected — medical attention required!")
     elif minor_cases > 0:
@@ -77,6 +111,23 @@ if dataset_file:
         st.warning("⚠ High average heart rate — possible overtraining.")
     else:
         st.success("✔ Athlete’s overall health looks excellent!")
+    # -------- ATHLETE x EVENT COMPARISON --------
+    # One grouped pass per dataset; ranking and the heatmap reshape that table
+    st.markdown("Athlete × Event Comparison")
+    from athlete_compare import HIGHER_IS_BETTER, dataset_comparison, event_pivot, rank_athletes
+    from charts import heatmap
+    table = dataset_comparison(loaded)
+    rank_options = [m for m in HIGHER_IS_BETTER if f"{m}_mean" in table.columns or m in table.columns]
+    colM, colE, colN = st.columns([1, 2, 1])
+    rank_by = colM.selectbox("Rank athletes by:", rank_options)
+    compare_events = colE.multiselect("Events to compare (empty = all):", events)
+    top_n = int(colN.number_input("Athletes to show:", min_value=1, max_value=len(athletes), value=min(20, len(athletes))))
+    ranking = rank_athletes(table, rank_by, compare_events)
+    st.dataframe(ranking.head(top_n), use_container_width=True)
+    heat_column = f"{rank_by}_mean" if f"{rank_by}_mean" in table.columns else rank_by
+    fig4 = cached_chart((loaded.key, "compare", heat_column, tuple(compare_events), top_n), lambda: heatmap(
+        event_pivot(table, heat_column, ranking.index[:top_n], compare_events), f"{rank_by} by athlete and event"))
+    st.plotly_chart(fig4, use_container_width=True)
     st.markdown("<hr>", unsafe_allow_html=True)
     st.markdown("<div class='footer'>Developed by Kanmani Murugaiya</div>",
                 unsafe_allow_html=True)
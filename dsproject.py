@@ -1,8 +1,7 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
 import random
+from athlete_generator import ATHLETES, EVENTS, generate
+from athlete_models import with_predictions
 st.set_page_config(page_title="Athlete Multi-Event Dashboard", layout="wide", page_icon="run")
 st.markdown("""
 <style>
@@ -32,38 +31,23 @@ st.markdown("""
     <p>Auto Dataset Generator + Injury Tracker + Event Comparison</p>
 </div>
 """, unsafe_allow_html=True)
-athletes = [
-    "Kanmani", "Priya", "Arjun", "Rahul", "Sneha", "Vishal", "Kavin", "Nisha", "Deepak", "Lavanya",
-    "Harini", "Santhosh", "Meena", "Ravi", "Swetha", "Dinesh", "Aarthi", "Vikram", "Gokul", "Divya",
-    "Karthik", "Sanjana", "Bala", "Naveen", "Preethi"
-]
-events = [
-    "100m Sprint", "200m Sprint", "400m Sprint", "800m Run", "Long Jump", "High Jump",
-    "Shot Put", "Javelin Throw", "Discus Throw", "Marathon", "Relay 4x100m",
-    "Pole Vault", "Triple Jump", "Hammer Throw", "Steeplechase"
-]
+athletes = ATHLETES
+events = EVENTS
 selected_athlete = st.selectbox("Select Athlete:", athletes)
-selected_events = st.multiselect("Select Events (or leave empty for random):", events, default=random.sample(events, 3))
+# Drawn once per session: a default that changed on every rerun would regenerate the dataset
+if "default_events" not in st.session_state:
+    st.session_state["default_events"] = random.sample(events, 3)
+selected_events = st.multiselect("Select Events (or leave empty for random):", events, default=st.session_state["default_events"])
 if selected_athlete:
     st.success(f"Generating event performance data for **{selected_athlete}** 🏃‍♀️")
-    np.random.seed(random.randint(1, 1000))
-    injuries = ["No Injury", "Minor", "Moderate", "Severe"]
-    all_data = []
+    if "dataset_seed" not in st.session_state:
+        st.session_state["dataset_seed"] = random.randint(1, 1000)
+    seed = st.number_input("Dataset seed:", min_value=0, step=1, key="dataset_seed")
     if not selected_events:
-        selected_events = random.sample(events, 5)
-    for event in selected_events:
-        for session in range(1, 6):  # 5 sessions per event
-            all_data.append({
-                "Athlete": selected_athlete,
-                "Event": event,
-                "Session": session,
-                "HeartRate": np.random.randint(60, 190),
-                "Speed": np.round(np.random.uniform(5, 28), 2),
-                "Calories": np.random.randint(250, 900),
-                "ReactionTime": np.round(np.random.uniform(0.2, 1.2), 2),
-                "Injury": random.choice(injuries)
-            })
-    df = pd.DataFrame(all_data)
+        selected_events = random.Random(int(seed)).sample(events, 5)
+    # The whole roster is generated from one seed so the comparison below has every athlete
+    roster = with_predictions(generate(athletes, selected_events, sessions=5, seed=int(seed)))  # 5 sessions per event
+    df = roster[roster["Athlete"] == selected_athlete].reset_index(drop=True)
     st.markdown("Generated Multi-Event Dataset")
     st.dataframe(df, use_container_width=True)
     st.markdown("Event-Wise Performance Overview")
@@ -73,19 +57,26 @@ if selected_athlete:
     col1.metric("Avg Heart Rate", f"{event_df['HeartRate'].mean():.1f} bpm")
     col2.metric("Avg Speed", f"{event_df['Speed'].mean():.1f} km/h")
     col3.metric("Avg Calories", f"{event_df['Calories'].mean():.1f}")
+    colP, colR = st.columns(2)
+    colP.metric("Predicted Speed", f"{event_df['Predicted_Speed'].mean():.1f} km/h")
+    colR.metric("Predicted Injury Risk", f"{event_df['Injury_Risk'].mean():.0%}")
+    # Charts (plotly loads here, after the table and metrics are on screen) are cached per generated dataset
+    from charts import cached_chart, injury_pie, session_bar, session_line
+    dataset_key = ("dsproject", tuple(selected_events), int(seed))
     colA, colB = st.columns(2)
     with colA:
-        fig1 = px.line(event_df, x="Session", y="HeartRate", title=f"Heart Rate Trend - {selected_event}", markers=True)
+        fig1 = cached_chart(dataset_key + (selected_athlete, selected_event, "heart_rate"), lambda: session_line(event_df, "HeartRate", f"Heart Rate Trend - {selected_event}"))
         st.plotly_chart(fig1, use_container_width=True)
     with colB:
-        fig2 = px.bar(event_df, x="Session", y="Speed", title=f"Speed per Session - {selected_event}", color="Speed", color_continuous_scale="Viridis")
+        fig2 = cached_chart(dataset_key + (selected_athlete, selected_event, "speed"), lambda: session_bar(event_df, "Speed", f"Speed per Session - {selected_event}"))
         st.plotly_chart(fig2, use_container_width=True)
     st.markdown("Injury Report (All Events)")
-    injury_summary = df["Injury"].value_counts().reset_index()
-    injury_summary.columns = ["Injury Type", "Count"]
-    fig3 = px.pie(injury_summary, values="Count", names="Injury Type", title="Overall Injury Distribution", color_discrete_sequence=px.colors.sequential.RdBu)
+    fig3 = cached_chart(dataset_key + (selected_athlete, "injuries"), lambda: injury_pie(df["Injury"].value_counts(), "Overall Injury Distribution", sequential="RdBu"))
     st.plotly_chart(fig3, use_container_width=True)
     st.markdown("Smart Insights")
+    from athlete_trends import compute_trends, trend_insights
+    for level, message in trend_insights(compute_trends(df), selected_athlete):
+        getattr(st, level)(message)
     avg_hr = df["HeartRate"].mean()
     severe_cases = (df["Injury"] == "Severe").sum()
     minor_cases = (df["Injury"] == "Minor").sum()
@@ -97,6 +88,19 @@ if selected_athlete:
         st.warning("High average heart rate — possible overtraining detected.")
     else:
         st.success("Athlete’s health and performance are excellent!")
+    st.markdown("Athlete × Event Comparison")
+    from athlete_compare import HIGHER_IS_BETTER, comparison_table, event_pivot, rank_athletes
+    from charts import heatmap
+    table = comparison_table(roster)
+    colM, colE = st.columns([1, 2])
+    rank_by = colM.selectbox("Rank athletes by:", list(HIGHER_IS_BETTER))
+    compare_events = colE.multiselect("Events to compare (empty = all):", selected_events)
+    ranking = rank_athletes(table, rank_by, compare_events)
+    st.caption(f"{selected_athlete} ranks #{ranking.loc[selected_athlete, 'Rank']} of {len(ranking)} by {rank_by}.")
+    st.dataframe(ranking, use_container_width=True)
+    heat_column = f"{rank_by}_mean" if f"{rank_by}_mean" in table.columns else rank_by
+    fig4 = cached_chart(dataset_key + ("compare", heat_column, tuple(compare_events)), lambda: heatmap(event_pivot(table, heat_column, ranking.index, compare_events), f"{rank_by} by athlete and event"))
+    st.plotly_chart(fig4, use_container_width=True)
 
     st.markdown("<hr>", unsafe_allow_html=True)
     st.markdown("<div class='footer'>Developed by Kanmani Murugaiya | Streamlit Multi-Event Dashboard</div>", unsafe_allow_html=True)
@@ -0,0 +1,130 @@
+# expense_backends.py
+"""
+Choosing where expense ledgers are stored.
+
+app.py (one ledger per user) and miniproject.py (a single ledger) both go
+through `get_expense_store(data_dir)`, which returns a LedgerStore (see
+expense_store) for one of:
+
+  files   ExpenseStore: a columnar snapshot plus change journal per user
+          under data_dir (the default).
+  sqlite  SQLiteExpenseStore: every ledger in data_dir/expenses.db, indexed
+          on (user, date) and (user, category).
+
+EXPENSE_BACKEND selects the backend for the whole process. Existing data is
+moved with the CLI:
+
+  python expense_backends.py migrate --data-dir user_data
+      copy every files-backend ledger (and legacy <user>_expenses.csv) into
+      the SQLite database
+  python expense_backends.py import-csv expense_data.csv --user default --data-dir expense_data
+      load one legacy CSV (e.g. miniproject.py's expense_data.csv) into a ledger
+"""
+import os
+import threading
+
+BACKENDS = ("files", "sqlite")
+DEFAULT_BACKEND = os.environ.get("EXPENSE_BACKEND", "files")
+DB_NAME = "expenses.db"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(data_dir, backend=None):
+    """A new LedgerStore for `data_dir` using `backend` (default EXPENSE_BACKEND)."""
+    backend = backend or DEFAULT_BACKEND
+    if backend == "files":
+        from expense_store import ExpenseStore
+        return ExpenseStore(data_dir)
+    if backend == "sqlite":
+        from expense_sqlite import SQLiteExpenseStore
+        return SQLiteExpenseStore(os.path.join(data_dir, DB_NAME))
+    raise ValueError(f"Unknown expense backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def get_expense_store(data_dir, backend=None):
+    """Return the process-wide LedgerStore for `data_dir` (Streamlit reruns reuse it)."""
+    key = (backend or DEFAULT_BACKEND, os.path.abspath(data_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = open_store(data_dir, backend)
+        return store
+
+
+def import_legacy_csv(store, username, path):
+    """
+    Load a legacy CSV ledger into `username`'s ledger and keep the CSV as
+    .bak; returns rows loaded. The CSV is claimed by renaming it first, so
+    when several sessions race to import it only one does; the others get
+    None.
+    """
+    backup = path + ".bak"
+    try:
+        os.replace(path, backup)
+    except FileNotFoundError:
+        return None  # another session claimed it
+    try:
+        store.import_csv(username, backup)
+    except BaseException:
+        os.replace(backup, path)  # leave it to be imported next time
+        raise
+    return len(store.read(username))
+
+
+def copy_ledgers(source, dest, usernames=None, replace=False):
+    """
+    Copy ledgers from one store to another, keeping expense IDs. Users that
+    already have expenses in `dest` are skipped unless `replace`. Returns
+    {username: rows copied}.
+    """
+    copied = {}
+    for username in usernames if usernames is not None else source.usernames():
+        if not replace and dest.rollup(username).count:
+            continue
+        df = source.read(username)
+        dest.save(username, df)
+        copied[username] = len(df)
+    return copied
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Move expense ledgers between storage backends.")
+    parser.add_argument("--data-dir", default=os.path.join(os.getcwd(), "user_data"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_mig = sub.add_parser("migrate", help="copy every ledger from one backend to another")
+    p_mig.add_argument("--from", dest="source", choices=BACKENDS, default="files")
+    p_mig.add_argument("--to", dest="dest", choices=BACKENDS, default="sqlite")
+    p_mig.add_argument("--replace", action="store_true", help="overwrite ledgers that already have expenses")
+    p_imp = sub.add_parser("import-csv", help="load a legacy CSV into one ledger (the CSV is kept as .bak)")
+    p_imp.add_argument("path")
+    p_imp.add_argument("--user", required=True)
+    p_imp.add_argument("--backend", choices=BACKENDS, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "migrate":
+        if args.source == args.dest:
+            parser.error("--from and --to must differ")
+        copied = copy_ledgers(open_store(args.data_dir, args.source), open_store(args.data_dir, args.dest),
+                              replace=args.replace)
+        for username, rows in copied.items():
+            print(f"{username}: {rows} rows")
+        print(f"Copied {len(copied)} ledgers to {args.dest} in {time.perf_counter() - start:.2f}s")
+    elif args.command == "import-csv":
+        rows = import_legacy_csv(open_store(args.data_dir, args.backend), args.user, args.path)
+        if rows is None:
+            parser.error(f"{args.path} not found")
+        print(f"{args.user}: {rows} rows in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# expense_batch.py
+"""
+Nightly cross-user analytics over every expense ledger.
+
+    python expense_batch.py --data-dir user_data --out analytics
+
+For each user it computes spend and expense count per (year-month, category),
+then folds those into global per-month/category totals (with the number of
+users who spent in each cell). Results go to a compact summary store in
+`--out`:
+
+  user_rollups.npz    user, ym, category, amount, count (one row per cell)
+  global_rollups.npz  ym, category, amount, count, users
+  manifest.json       the file signatures the results were computed from
+
+Runs are incremental. With the files backend a user's signature is the
+size/mtime of their snapshot, journal and legacy CSV, gathered in one
+directory scan; only users whose signature changed are re-read, spread over
+a process pool, and the rest of the previous summary is kept. With the
+sqlite backend the per-user ledger version is the signature and the changed
+users are aggregated by SQLite in one GROUP BY instead.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from expense_store import atomic_write, decode_strings, encode_strings, read_npz_categories
+
+SUMMARY_VERSION = 1
+MANIFEST = "manifest.json"
+USER_ROLLUPS = "user_rollups.npz"
+GLOBAL_ROLLUPS = "global_rollups.npz"
+LEDGER_SUFFIXES = ("_expenses.npz", "_expenses.journal", "_expenses.csv")
+# Below this many changed users the pool costs more than it saves.
+MIN_POOL_USERS = 64
+USER_COLUMNS = ["user", "ym", "category", "amount", "count"]
+
+
+# ---------------------------
+# Per-ledger rollup
+# ---------------------------
+
+def _rollup(days, codes, categories, amounts):
+    """Month x category sums/counts from per-row day numbers and category codes into `categories`."""
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    ym = (months // 12 + 1970) * 100 + months % 12 + 1
+    width = max(len(categories), 1)
+    cells, inverse = np.unique(ym * width + codes, return_inverse=True)
+    amount = np.bincount(inverse, weights=amounts, minlength=len(cells))
+    count = np.bincount(inverse, minlength=len(cells)).astype(np.int64)
+    return (cells // width).astype(np.int32), np.asarray(categories, dtype=object)[cells % width], amount, count
+
+
+def _empty_rollup():
+    return np.empty(0, np.int32), np.empty(0, object), np.empty(0, np.float64), np.empty(0, np.int64)
+
+
+def ledger_rollup(df):
+    """(ym, category, amount, count) arrays: one entry per month x category of `df`."""
+    if df.empty:
+        return _empty_rollup()
+    # Uncategorised rows count towards totals under "", as in expense_rollup.
+    codes, categories = pd.factorize(df["Category"].fillna("").astype(str).to_numpy(dtype=object))
+    return _rollup(df["Date"].to_numpy().astype("datetime64[D]"), codes, categories, df["Amount"].to_numpy(dtype=np.float64))
+
+
+def snapshot_rollup(path):
+    """ledger_rollup for a snapshot with no journal, read straight from its date/amount/category arrays."""
+    days, amounts, codes, categories = read_npz_categories(path)
+    if not len(days):
+        return _empty_rollup()
+    if (codes < 0).any():
+        blank = np.flatnonzero(categories == "")
+        if len(blank):
+            codes = np.where(codes < 0, blank[0], codes)
+        else:
+            codes = np.where(codes < 0, len(categories), codes)
+            categories = np.append(categories, "")
+    return _rollup(days, codes, categories, amounts)
+
+
+_worker_store = None
+
+
+def _init_worker(data_dir):
+    global _worker_store
+    from expense_store import ExpenseStore
+    _worker_store = ExpenseStore(data_dir)
+
+
+def _summarize_user(username):
+    store = _worker_store
+    # Most ledgers are a bare snapshot between compactions: skip the frame.
+    if os.path.exists(store.snapshot_path(username)) and not os.path.exists(store.journal_path(username)):
+        return username, snapshot_rollup(store.snapshot_path(username))
+    return username, ledger_rollup(store.read_uncached(username))
+
+
+# ---------------------------
+# Signatures
+# ---------------------------
+
+def file_signatures(data_dir):
+    """{username: [[suffix, size, mtime_ns], ...]} for every files-backend ledger, from one directory scan."""
+    signatures = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            for suffix in LEDGER_SUFFIXES:
+                if entry.name.endswith(suffix):
+                    st = entry.stat()
+                    signatures.setdefault(entry.name[: -len(suffix)], []).append([suffix, st.st_size, st.st_mtime_ns])
+                    break
+    for parts in signatures.values():
+        parts.sort()
+    # A journal without a snapshot or CSV is not a ledger (yet).
+    return {u: parts for u, parts in signatures.items() if any(p[0] != "_expenses.journal" for p in parts)}
+
+
+def sqlite_signatures(store):
+    return {user: version for user, version in store._conn().execute("SELECT user, version FROM ledgers")}
+
+
+def _sqlite_rollups(store, usernames):
+    """Per-user rollups for `usernames`, aggregated by SQLite (the (user, date) index keeps it one pass per user)."""
+    results = {u: ([], [], [], []) for u in usernames}
+    conn = store._conn()
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_users (user TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM batch_users")
+    conn.executemany("INSERT INTO batch_users VALUES (?)", ((u,) for u in usernames))
+    rows = conn.execute(
+        "SELECT e.user, CAST(substr(e.date, 1, 4) || substr(e.date, 6, 2) AS INTEGER), COALESCE(e.category, ''), "
+        "SUM(e.amount), COUNT(*) FROM batch_users b JOIN expenses e ON e.user = b.user GROUP BY 1, 2, 3")
+    for user, ym, category, amount, count in rows:
+        for column, value in zip(results[user], (ym, category, amount, count)):
+            column.append(value)
+    return [(u, (np.array(ym, np.int32), np.array(cat, object), np.array(amt, np.float64), np.array(cnt, np.int64)))
+            for u, (ym, cat, amt, cnt) in results.items()]
+
+
+# ---------------------------
+# Summary store
+# ---------------------------
+
+def _write_table(path, columns):
+    arrays = {"format_version": np.array([SUMMARY_VERSION], dtype=np.int32)}
+    for name, values in columns.items():
+        if values.dtype == object:
+            arrays[f"{name}_codes"], arrays[f"{name}_blob"], arrays[f"{name}_offsets"] = encode_strings(values)
+        else:
+            arrays[name] = values
+    atomic_write(path, lambda f: np.savez(f, **arrays))
+
+
+def _read_table(path):
+    with np.load(path, allow_pickle=False) as z:
+        if int(z["format_version"][0]) != SUMMARY_VERSION:
+            raise ValueError(f"Unsupported summary format in {path}")
+        columns = {}
+        for key in z.files:
+            if key.endswith("_codes"):
+                name = key[: -len("_codes")]
+                columns[name] = decode_strings(z[key], z[f"{name}_blob"], z[f"{name}_offsets"])
+            elif key != "format_version" and not key.endswith(("_blob", "_offsets")):
+                columns[key] = z[key]
+    return pd.DataFrame(columns)
+
+
+def load_user_rollups(out_dir):
+    """Per-user month x category rollups from the last run."""
+    return _read_table(os.path.join(out_dir, USER_ROLLUPS))
+
+
+def load_global_rollups(out_dir):
+    """Global month x category rollups (with the number of users per cell) from the last run."""
+    return _read_table(os.path.join(out_dir, GLOBAL_ROLLUPS))
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def global_rollups(users):
+    """Fold a user rollup frame into totals per (ym, category)."""
+    grouped = users.groupby(["ym", "category"], sort=True).agg(
+        amount=("amount", "sum"), count=("count", "sum"), users=("user", "size"))
+    return grouped.reset_index()
+
+
+# ---------------------------
+# Run
+# ---------------------------
+
+def run(data_dir, out_dir, workers=None, full=False, backend=None):
+    """
+    Bring the summary store in `out_dir` up to date with the ledgers in
+    `data_dir`. Returns {"users", "changed", "removed", "rows", "seconds"}.
+    """
+    from expense_backends import DEFAULT_BACKEND, open_store
+
+    start = time.perf_counter()
+    backend = backend or DEFAULT_BACKEND
+    os.makedirs(out_dir, exist_ok=True)
+    if backend == "sqlite":
+        store = open_store(data_dir, backend)
+        signatures = sqlite_signatures(store)
+    else:
+        signatures = file_signatures(data_dir)
+
+    manifest = _load_manifest(out_dir)
+    source = {"backend": backend, "data_dir": os.path.abspath(data_dir)}
+    previous = None
+    if not full and manifest is not None and manifest.get("source") == source \
+            and os.path.exists(os.path.join(out_dir, USER_ROLLUPS)):
+        previous = load_user_rollups(out_dir)
+        seen = manifest["users"]
+    else:
+        seen = {}
+    changed = sorted(u for u, sig in signatures.items() if seen.get(u) != sig)
+    removed = sorted(set(seen) - set(signatures))
+
+    if backend == "sqlite":
+        results = _sqlite_rollups(store, changed)
+    elif workers == 1 or len(changed) < MIN_POOL_USERS:
+        _init_worker(data_dir)
+        results = [_summarize_user(u) for u in changed]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+            chunk = max(1, len(changed) // ((workers or os.cpu_count() or 1) * 8))
+            results = list(pool.map(_summarize_user, changed, chunksize=chunk))
+
+    parts = []
+    if previous is not None:
+        keep = ~np.isin(previous["user"].to_numpy(dtype=object), np.array(changed + removed, dtype=object))
+        parts.append(previous[keep])
+    if results:
+        lengths = np.array([len(r[0]) for _, r in results])
+        parts.append(pd.DataFrame({
+            "user": np.repeat(np.array([u for u, _ in results], dtype=object), lengths),
+            "ym": np.concatenate([r[0] for _, r in results]).astype(np.int32),
+            "category": np.concatenate([r[1] for _, r in results]).astype(object),
+            "amount": np.concatenate([r[2] for _, r in results]).astype(np.float64),
+            "count": np.concatenate([r[3] for _, r in results]).astype(np.int64),
+        }))
+    users = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame({
+        "user": np.empty(0, object), "ym": np.empty(0, np.int32), "category": np.empty(0, object),
+        "amount": np.empty(0, np.float64), "count": np.empty(0, np.int64)})
+    users = users.sort_values(["user", "ym", "category"], kind="stable").reset_index(drop=True)
+    totals = global_rollups(users)
+
+    _write_table(os.path.join(out_dir, USER_ROLLUPS), {c: users[c].to_numpy() for c in USER_COLUMNS})
+    _write_table(os.path.join(out_dir, GLOBAL_ROLLUPS), {c: totals[c].to_numpy() for c in totals.columns})
+    # Written last: if anything above fails, the next run redoes these users.
+    payload = json.dumps({"format_version": SUMMARY_VERSION, "source": source, "users": signatures}).encode("utf-8")
+    atomic_write(os.path.join(out_dir, MANIFEST), lambda f: f.write(payload))
+    return {"users": len(signatures), "changed": len(changed), "removed": len(removed),
+            "rows": len(users), "seconds": time.perf_counter() - start}
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate every user's expenses into per-user and global rollups.")
+    parser.add_argument("--data-dir", default=os.path.join(os.getcwd(), "user_data"))
+    parser.add_argument("--out", default=os.path.join(os.getcwd(), "analytics"))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--backend", choices=("files", "sqlite"), default=None)
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and recompute every user")
+    parser.add_argument("--show", type=int, default=0, metavar="N", help="print the N most recent global months")
+    args = parser.parse_args(argv)
+
+    result = run(args.data_dir, args.out, workers=args.workers, full=args.full, backend=args.backend)
+    print(f"{result['users']} users: {result['changed']} recomputed, {result['removed']} removed, "
+          f"{result['users'] - result['changed']} unchanged; {result['rows']} rollup rows in {result['seconds']:.2f}s")
+    if args.show:
+        totals = load_global_rollups(args.out)
+        months = totals.groupby("ym")[["amount", "count"]].sum().tail(args.show)
+        for ym, row in months.iterrows():
+            print(f"{ym // 100}-{ym % 100:02d}  ₹{row['amount']:,.2f}  ({int(row['count'])} expenses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# expense_forecast.py
+"""
+Month-end spending forecast and budget alerts for app.py.
+
+DailySpend keeps a dense (category x day) array of the user's spend. It is
+built once per ledger with a single bincount and then patched with just the
+rows each add/edit/delete touches (the store keeps it alongside the ledger
+through LedgerStore.incremental), so a forecast on every rerun is a few
+array slices however many years of history there are.
+
+The forecast for a month adds, per category, the spend so far to a
+projection for each remaining day:
+  - seasonality: the mean spend on that day of the month over the previous
+    SEASON_MONTHS months (rent on the 1st, bills at month end, ...);
+  - pace: that seasonal spend scaled by the last RECENT_DAYS of spend
+    against the same rolling window in those months.
+Categories without prior months fall back to the RECENT_DAYS rolling
+average per day. Expenses already entered for later in the month are
+never projected below their amount. Summing the categories gives the
+projected cumulative spend per day, which `budget_alerts` compares
+against the salary to say when it will run out.
+"""
+from collections import namedtuple
+import calendar
+import threading
+
+import numpy as np
+import pandas as pd
+
+from expense_index import day_numbers
+
+RECENT_DAYS = 28
+SEASON_MONTHS = 6
+# Days of usual spend added to both sides of the pace ratio, and its bounds.
+PACE_PRIOR_DAYS = 7
+MAX_PACE = 4.0
+# Extra days allocated past the newest expense, so adds for today don't regrow the array.
+SLACK_DAYS = 62
+# A category is flagged when its projection is this far above its usual month.
+SPIKE_RATIO = 1.5
+
+_Days = namedtuple("_Days", ["start", "categories", "days"])
+Forecast = namedtuple("Forecast", ["year", "month", "elapsed", "spent", "projected", "path", "categories"])
+
+
+class DailySpend:
+    """
+    Per-category spend per day, as rows of a dense array starting at day
+    number `start`. The store patches it while other sessions forecast from
+    it, so a patch builds the new array aside and swaps it in with the
+    categories as one reference; readers work from `snapshot()`.
+    """
+
+    def __init__(self):
+        self._state = _Days(0, (), np.zeros((0, 0)))
+        self._rows = {}
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        daily = cls()
+        daily._state = daily._added(daily._state, df, 1)
+        return daily
+
+    @property
+    def start(self):
+        return self._state.start
+
+    @property
+    def categories(self):
+        return self._state.categories
+
+    @property
+    def days(self):
+        return self._state.days
+
+    @property
+    def end(self):
+        """One past the last day covered."""
+        return self._state.start + self._state.days.shape[1]
+
+    @property
+    def nbytes(self):
+        return self._state.days.nbytes
+
+    def snapshot(self):
+        """A DailySpend fixed at the current state, unaffected by later patches."""
+        view = DailySpend()
+        view._state = self._state
+        return view
+
+    def _added(self, state, df, sign):
+        """`state` with `df`'s amounts times `sign` added, as a new _Days (grown as needed)."""
+        if df.empty:
+            return state
+        days = day_numbers(df["Date"])
+        # Uncategorised rows count under "", as in expense_rollup.
+        codes, uniques = pd.factorize(df["Category"].fillna("").astype(str).to_numpy(dtype=object))
+        categories = list(state.categories)
+        for category in uniques:
+            if category not in self._rows:
+                self._rows[category] = len(categories)
+                categories.append(category)
+        rows = np.array([self._rows[c] for c in uniques], dtype=np.int64)[codes]
+
+        lo, hi = int(days.min()), int(days.max())
+        width = state.days.shape[1]
+        if width == 0:
+            start, end = lo, hi + 1 + SLACK_DAYS
+        else:
+            old_end = state.start + width
+            start = min(lo, state.start)
+            end = max(hi + 1 + SLACK_DAYS, old_end) if hi >= old_end else old_end
+        grid = np.zeros((len(categories), end - start))
+        if width:
+            grid[:len(state.categories), state.start - start:state.start - start + width] = state.days
+        flat = np.bincount(rows * grid.shape[1] + (days - start), weights=sign * df["Amount"].to_numpy(dtype=np.float64),
+                           minlength=grid.size)
+        grid += flat.reshape(grid.shape)
+        return _Days(start, tuple(categories), grid)
+
+    def apply(self, old_rows, new_rows):
+        """Replace the contribution of `old_rows` with that of `new_rows` (the same IDs before/after a change)."""
+        with self._write_lock:
+            self._state = self._added(self._added(self._state, old_rows, -1), new_rows, 1)
+
+    def window(self, lo, hi):
+        """(category x day) spend for day numbers lo..hi-1, zero outside the recorded range."""
+        state = self._state
+        out = np.zeros((len(state.categories), max(0, hi - lo)))
+        a, b = max(lo, state.start), min(hi, state.start + state.days.shape[1])
+        if a < b:
+            out[:, a - lo:b - lo] = state.days[:, a - state.start:b - state.start]
+        return out
+
+
+def _day_number(year, month, day=1):
+    return int(day_numbers([pd.Timestamp(year=int(year), month=int(month), day=day)])[0])
+
+
+def _prior_months(year, month, count):
+    for _ in range(count):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        yield year, month
+
+
+def month_forecast(daily, year, month, today):
+    """Forecast for year-month as seen on `today` (a date); past months are just their actual spend."""
+    daily = daily.snapshot()  # one consistent state, whatever changes meanwhile
+    length = calendar.monthrange(int(year), int(month))[1]
+    first = _day_number(year, month)
+    elapsed = int(min(max(day_numbers([today])[0] - first + 1, 0), length))
+    spent = daily.window(first, first + elapsed)
+
+    remaining = np.zeros((len(daily.categories), length - elapsed))
+    usual = np.full(len(daily.categories), np.nan)
+    if elapsed < length and daily.categories:
+        now = first + elapsed
+        # At least this month's elapsed days, so a first expense today isn't read as a daily rate.
+        span = min(RECENT_DAYS, max(now - daily.start, elapsed))
+        recent = daily.window(now - span, now).sum(axis=1) if span > 0 else np.zeros(len(daily.categories))
+        remaining[:] = recent[:, None] / max(span, 1)
+        # Day-of-month profiles over the prior months the history fully
+        # covers, plus what the same rolling window held in each of them.
+        profiles, baselines = [], []
+        for y, m in _prior_months(int(year), int(month), SEASON_MONTHS):
+            lo = _day_number(y, m)
+            days_in = calendar.monthrange(y, m)[1]
+            if lo < daily.start:
+                break
+            grid = np.full((len(daily.categories), 31), np.nan)
+            grid[:, :days_in] = daily.window(lo, lo + days_in)
+            profiles.append(grid)
+            baselines.append(daily.window(lo + elapsed - span, lo + elapsed).sum(axis=1) if span > 0 else 0.0)
+        if profiles:
+            profile = np.nanmean(np.stack(profiles), axis=0)
+            usual = np.nansum(profile, axis=1)
+            # Pace: this rolling window against the usual one, shrunk towards 1
+            # by PACE_PRIOR_DAYS of usual spend so a quiet or busy week doesn't swing it.
+            prior = usual / 30.4 * PACE_PRIOR_DAYS
+            pace = np.clip((recent + prior) / (np.mean(baselines, axis=0) + prior + 1e-9), 1 / MAX_PACE, MAX_PACE)
+            seasonal = profile[:, elapsed:length] * pace[:, None]
+            # Categories with no history, and days missing from shorter prior
+            # months (the 31st), keep the plain rolling average.
+            known = (usual > 0)[:, None] & ~np.isnan(seasonal)
+            remaining = np.where(known, seasonal, remaining)
+        # Expenses already entered for later this month (rent dated the
+        # 28th, ...) count in full; a projection for the same day and
+        # category only adds whatever it expects on top of them.
+        remaining = np.maximum(remaining, daily.window(now, first + length))
+
+    path = np.cumsum(np.concatenate([spent.sum(axis=0), remaining.sum(axis=0)]))
+    by_category = pd.DataFrame({
+        "Spent": spent.sum(axis=1),
+        "Projected": spent.sum(axis=1) + remaining.sum(axis=1),
+        "Usual": usual,
+    }, index=pd.Index(daily.categories, name="Category"))
+    by_category = by_category[by_category.index != ""]
+    by_category = by_category[(by_category["Projected"] > 0.005) | (by_category["Usual"] > 0.005)]
+    return Forecast(int(year), int(month), elapsed, float(path[elapsed - 1]) if elapsed else 0.0,
+                    float(path[-1]), path, by_category.sort_values("Projected", ascending=False))
+
+
+def _ordinal(day):
+    suffix = "th" if 11 <= day % 100 <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+    return f"{day}{suffix}"
+
+
+def budget_alerts(forecast, salary):
+    """(level, message) warnings from a forecast, most serious first; level is an st.* call name."""
+    alerts = []
+    if forecast.elapsed >= len(forecast.path):
+        return alerts  # the month is over; the actual totals say it all
+    if salary and salary > 0 and forecast.spent <= salary < forecast.projected:
+        day = int(np.argmax(forecast.path > salary)) + 1
+        alerts.append(("warning", f"On pace to exceed your salary by the {_ordinal(day)} "
+                                  f"(projected ₹{forecast.projected:,.2f} for the month)."))
+    elif salary and salary > 0 and forecast.spent <= salary and salary - forecast.projected < 100:
+        alerts.append(("warning", f"Projected to save only ₹{salary - forecast.projected:,.2f} this month."))
+    cats = forecast.categories
+    spikes = cats[(cats["Usual"] > 0) & (cats["Projected"] > SPIKE_RATIO * cats["Usual"])]
+    for category, row in spikes.head(3).iterrows():
+        alerts.append(("info", f"{category} is on pace for ₹{row['Projected']:,.2f}, "
+                               f"{row['Projected'] / row['Usual'] - 1:.0%} above its usual ₹{row['Usual']:,.2f}."))
+    return alerts
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def _ledger(rows):
+    return pd.DataFrame(rows, columns=["Date", "Amount", "Category"]).assign(Date=lambda d: pd.to_datetime(d["Date"]))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check month_forecast on small hand-made ledgers.")
+    parser.parse_args(argv)
+
+    today = pd.Timestamp("2026-10-18")
+    # Rent entered ahead of its date counts towards the month and the salary.
+    daily = DailySpend.from_frame(_ledger([("2026-10-02", 100.0, "Food"), ("2026-10-28", 20000.0, "Rent")]))
+    forecast = month_forecast(daily, 2026, 10, today)
+    assert forecast.spent == 100.0, forecast.spent
+    assert forecast.projected >= 20100.0, forecast.projected
+    assert "Rent" in forecast.categories.index, forecast.categories
+    assert budget_alerts(forecast, 15000)[0][0] == "warning"
+
+    # Rent that always falls on the 28th is counted once, not projected on top of the entry.
+    history = [(f"2026-{m:02d}-28", 20000.0, "Rent") for m in range(4, 11)]
+    forecast = month_forecast(DailySpend.from_frame(_ledger(history)), 2026, 10, today)
+    assert abs(forecast.projected - 20000.0) < 1e-6, forecast.projected
+    print("month_forecast checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# expense_import.py
+"""
+Bulk import of expenses from a CSV export or bank statement.
+
+The file is parsed in chunks, each chunk's dates and amounts are normalised
+with vectorised pandas operations, rows already in the ledger are dropped by
+comparing 64-bit row hashes, and everything left is committed with a single
+ExpenseStore.add_many call.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+
+# Header names we recognise (compared case-insensitively), in priority order.
+DATE_COLUMNS = ["date", "transaction date", "txn date", "value date", "posting date"]
+AMOUNT_COLUMNS = ["amount", "debit", "withdrawal", "withdrawal amount", "debit amount", "amount (inr)"]
+CATEGORY_COLUMNS = ["category"]
+DESCRIPTION_COLUMNS = ["description", "narration", "details", "particulars", "remarks", "memo"]
+
+# Currency markers removed before the digits are picked out ("Rs." would otherwise leave a leading dot).
+CURRENCY_PATTERN = r"(?i)\b(?:rs|inr)\b\.?|₹"
+# Accounting notation for a negative amount: "(250.00)".
+PARENTHESES_PATTERN = r"^\s*\((.*)\)\s*$"
+
+ImportResult = namedtuple("ImportResult", ["imported", "duplicates", "invalid"])
+
+
+def detect_columns(header):
+    """Map our column names to the matching headers in `header` (None where absent)."""
+    lookup = {str(h).strip().lower(): h for h in header}
+
+    def pick(candidates):
+        for name in candidates:
+            if name in lookup:
+                return lookup[name]
+        return None
+
+    columns = {
+        "Date": pick(DATE_COLUMNS),
+        "Amount": pick(AMOUNT_COLUMNS),
+        "Category": pick(CATEGORY_COLUMNS),
+        "Description": pick(DESCRIPTION_COLUMNS),
+    }
+    if columns["Date"] is None or columns["Amount"] is None:
+        raise ValueError("Could not find a date and an amount column in the uploaded file.")
+    return columns
+
+
+def parse_amounts(raw):
+    """Return (amounts as floats, NaN where unreadable; mask of amounts written in parentheses)."""
+    if pd.api.types.is_numeric_dtype(raw):
+        return pd.to_numeric(raw, errors="coerce"), pd.Series(False, index=raw.index)
+    text = raw.astype(str).str.replace(CURRENCY_PATTERN, "", regex=True)
+    bracketed = text.str.match(PARENTHESES_PATTERN) & raw.notna()
+    text = text.str.replace(PARENTHESES_PATTERN, r"\1", regex=True).str.replace(r"[^0-9.\-]", "", regex=True)
+    amounts = pd.to_numeric(text, errors="coerce")
+    return amounts.where(~bracketed, -amounts.abs()), bracketed
+
+
+def normalize_chunk(chunk, columns, default_category="General", signed=False, dayfirst=False):
+    """
+    Return (clean rows, number of rejected rows) for one raw chunk.
+
+    Amounts may carry currency markers (Rs., INR, ₹) or thousands
+    separators, and a parenthesised amount is negative. With `signed=True`
+    only negative amounts (money going out) are kept, as expenses;
+    otherwise the absolute value is used, except that parenthesised amounts
+    are credits and are skipped.
+    """
+    dates = pd.to_datetime(chunk[columns["Date"]], errors="coerce", dayfirst=dayfirst)
+    amounts, bracketed = parse_amounts(chunk[columns["Amount"]])
+    if signed:
+        valid = amounts < 0
+    else:
+        valid = amounts.notna() & (amounts != 0) & ~bracketed
+    valid &= dates.notna()
+
+    if columns["Category"] is not None:
+        category = chunk[columns["Category"]].astype(object).where(chunk[columns["Category"]].notna(), default_category)
+    else:
+        category = pd.Series(default_category, index=chunk.index, dtype=object)
+    if columns["Description"] is not None:
+        description = chunk[columns["Description"]].astype(object).where(chunk[columns["Description"]].notna(), "")
+    else:
+        description = pd.Series("", index=chunk.index, dtype=object)
+
+    rows = pd.DataFrame({
+        "Date": dates.dt.normalize(),
+        "Amount": amounts.abs().round(2),
+        "Category": category.astype(str).str.strip(),
+        "Description": description.astype(str).str.strip(),
+    })[valid.to_numpy()]
+    return rows, int((~valid).sum())
+
+
+def parse_statement(file, default_category="General", signed=False, dayfirst=False, chunksize=CHUNK_ROWS):
+    """Stream `file` (path or file object) in chunks; return (clean rows, rejected count)."""
+    parts = []
+    invalid = 0
+    columns = None
+    for chunk in pd.read_csv(file, chunksize=chunksize, dtype=str, keep_default_na=True, skipinitialspace=True):
+        if columns is None:
+            columns = detect_columns(chunk.columns)
+        rows, bad = normalize_chunk(chunk, columns, default_category, signed, dayfirst)
+        parts.append(rows)
+        invalid += bad
+    if not parts:
+        return pd.DataFrame(columns=["Date", "Amount", "Category", "Description"]), 0
+    return pd.concat(parts, ignore_index=True), invalid
+
+
+def expense_hashes(df):
+    """64-bit hash per row of (day, amount in paise, category, description)."""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    keys = pd.DataFrame({
+        "day": pd.to_datetime(df["Date"]).values.astype("datetime64[D]").astype(np.int64),
+        "paise": np.round(df["Amount"].to_numpy(dtype=float) * 100).astype(np.int64),
+        "category": df["Category"].fillna("").astype(str).str.strip().values,
+        "description": df["Description"].fillna("").astype(str).str.strip().values,
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def ledger_hash_index(df):
+    """Sorted hashes of every ledger row, for membership tests by binary search."""
+    return np.sort(expense_hashes(df))
+
+
+def import_statement(store, username, file, default_category="General", signed=False, dayfirst=False):
+    """Parse `file`, drop rows already in the user's ledger, add the rest in one batch."""
+    rows, invalid = parse_statement(file, default_category, signed, dayfirst)
+    if rows.empty:
+        return ImportResult(0, 0, invalid)
+    existing = store.derived(username, "import_hashes", ledger_hash_index)
+    hashes = expense_hashes(rows)
+    if len(existing):
+        pos = np.minimum(np.searchsorted(existing, hashes), len(existing) - 1)
+        new = existing[pos] != hashes
+    else:
+        new = np.ones(len(rows), dtype=bool)
+    store.add_many(username, rows[new])
+    return ImportResult(int(new.sum()), int((~new).sum()), invalid)
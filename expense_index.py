@@ -0,0 +1,63 @@
+# expense_index.py
+"""
+Lookup structures over a ledger frame.
+
+Ledgers are kept in ascending expense-ID order (IDs are handed out
+monotonically and new rows are appended), so `locate` finds any set of IDs
+with a binary search instead of a scan.
+
+LedgerIndex is the newest-first ordering used by the expense list: `order` holds row positions sorted by Date (newest first, ties by ID), and
+`neg_days` the matching negated day numbers in ascending order, so a date
+range is two binary searches and a page is a slice of `order`. Category and
+description filters are only evaluated on the rows inside the date range.
+"""
+import numpy as np
+import pandas as pd
+
+
+def locate(sorted_ids, ids):
+    """Row positions of `ids` in the ascending `sorted_ids` array, -1 where absent."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == ids, pos, -1)
+
+
+def day_numbers(dates):
+    """Dates as int64 days since 1970-01-01."""
+    return pd.to_datetime(dates).values.astype("datetime64[D]").astype(np.int64)
+
+
+class LedgerIndex:
+    def __init__(self, df):
+        days = day_numbers(df["Date"]) if len(df) else np.empty(0, dtype=np.int64)
+        ids = df["ID"].to_numpy(dtype=np.int64)
+        # One argsort on a packed (day, id) key: newest day first, then newest ID.
+        key = (days << 32) | (ids & 0xFFFFFFFF)
+        self.order = np.argsort(-key, kind="stable")
+        self.neg_days = -days[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def date_slice(self, start=None, end=None):
+        """Bounds (lo, hi) into `order` of rows with start <= Date <= end."""
+        lo, hi = 0, len(self.order)
+        if end is not None:
+            lo = int(np.searchsorted(self.neg_days, -day_numbers([end])[0], side="left"))
+        if start is not None:
+            hi = int(np.searchsorted(self.neg_days, -day_numbers([start])[0], side="right"))
+        return lo, max(lo, hi)
+
+    def filter(self, df, start=None, end=None, categories=None, search=None):
+        """Row positions (newest first) matching every filter that is set."""
+        lo, hi = self.date_slice(start, end)
+        positions = self.order[lo:hi]
+        if categories:
+            cats = df["Category"].to_numpy(dtype=object)[positions]
+            positions = positions[pd.Series(cats, dtype=object).isin(categories).to_numpy()]
+        if search:
+            desc = pd.Series(df["Description"].to_numpy(dtype=object)[positions], dtype=object)
+            positions = positions[desc.str.contains(search, case=False, regex=False, na=False).to_numpy(dtype=bool)]
+        return positions
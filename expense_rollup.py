@@ -0,0 +1,107 @@
+# expense_rollup.py
+"""
+Per-user aggregate index for the app.py dashboard.
+
+Keeps, for every year-month, the amount sum and row count per category plus a
+running all-time total. It is built with one groupby when a ledger is first
+loaded and then patched with the rows touched by each journal replay, so the
+Quick Summary, savings bar and pie chart never scan the full ledger.
+"""
+from collections import namedtuple
+import threading
+
+import pandas as pd
+
+
+def month_key(year, month):
+    return int(year) * 100 + int(month)
+
+
+_Totals = namedtuple("_Totals", ["months", "total", "count"])
+
+
+class Rollup:
+    """
+    The aggregates are replaced, never changed in place: a patch copies the
+    month dicts it touches and swaps the result in as one reference, so
+    sessions reading a shared rollup while the store patches it see either
+    the old or the new totals.
+    """
+
+    def __init__(self):
+        # months: {yyyymm: {category: (sum, count)}}
+        self._state = _Totals({}, 0.0, 0)
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        rollup = cls()
+        rollup._state = rollup._added(rollup._state, df, 1)
+        return rollup
+
+    @property
+    def months(self):
+        return self._state.months
+
+    @property
+    def total(self):
+        return self._state.total
+
+    @property
+    def count(self):
+        return self._state.count
+
+    @staticmethod
+    def _added(state, df, sign):
+        if df.empty:
+            return state
+        dates = pd.to_datetime(df["Date"])
+        keys = pd.DataFrame({
+            "ym": dates.dt.year * 100 + dates.dt.month,
+            "Category": df["Category"].fillna("").astype(str).values,
+            "Amount": df["Amount"].astype(float).values,
+        })
+        grouped = keys.groupby(["ym", "Category"], sort=False)["Amount"].agg(["sum", "count"])
+        months, copied = dict(state.months), set()
+        total, count = state.total, state.count
+        for (ym, category), (amount, n) in zip(grouped.index, grouped.values):
+            ym = int(ym)
+            if ym not in copied:
+                months[ym] = dict(months.get(ym, {}))
+                copied.add(ym)
+            cats = months[ym]
+            cell_sum, cell_count = cats.get(category, (0.0, 0))
+            cell_sum, cell_count = cell_sum + sign * amount, cell_count + sign * int(n)
+            if cell_count <= 0:
+                cats.pop(category, None)
+            else:
+                cats[category] = (cell_sum, cell_count)
+            total += sign * amount
+            count += sign * int(n)
+        for ym in copied:
+            if not months[ym]:
+                del months[ym]
+        if count == 0:
+            # Don't let float drift leave a non-zero total on an empty ledger.
+            total = 0.0
+        return _Totals(months, total, count)
+
+    def apply(self, old_rows, new_rows):
+        """Replace the contribution of `old_rows` with that of `new_rows` (the same IDs before/after a change)."""
+        with self._write_lock:
+            self._state = self._added(self._added(self._state, old_rows, -1), new_rows, 1)
+
+    def categories(self):
+        """Every category that has at least one expense, sorted."""
+        return sorted({c for cats in self.months.values() for c in cats if c != ""})
+
+    def month_total(self, year, month):
+        return sum(cell[0] for cell in self.months.get(month_key(year, month), {}).values())
+
+    def month_count(self, year, month):
+        return sum(cell[1] for cell in self.months.get(month_key(year, month), {}).values())
+
+    def month_categories(self, year, month):
+        """Per-category spend for one month, largest first (uncategorised rows are left out, as groupby does)."""
+        cats = self.months.get(month_key(year, month), {})
+        return pd.Series({c: cell[0] for c, cell in cats.items() if c != ""}, dtype=float).sort_values(ascending=False)
@@ -0,0 +1,360 @@
+# expense_sqlite.py
+"""
+SQLite ledger backend (the "sqlite" backend, see expense_backends).
+
+Every user's expenses live in one `expenses` table with indexes on
+(user, date) and (user, category), so a month's rows, totals and category
+breakdown are index range queries and adding an expense is a single-row
+insert. A small `ledgers` table holds each user's next expense ID and a
+version counter that every change bumps in the same transaction; the
+version is what read() validates the process-wide ledger cache against.
+
+Changes made through this process are patched into the cached frame (and
+its incremental structures) with the same replay used for the files
+backend's journal, so the expense list doesn't reload the whole ledger
+after each add.
+"""
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from expense_store import (
+    COLUMNS, COMPACT_BYTES, JOURNAL_BYTES_PER_ROW, LEDGER_DTYPES, VALUE_COLUMNS,
+    CachedLedger, ExpenseStore, LedgerStore, empty_ledger, ledger_cache, record_values,
+)
+
+# Users whose ledger row is known to exist, and rollups, kept per store (LRU).
+MAX_TRACKED_USERS = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledgers (
+    user TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS expenses (
+    user TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT,
+    description TEXT,
+    PRIMARY KEY (user, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS expenses_user_date ON expenses (user, date);
+CREATE INDEX IF NOT EXISTS expenses_user_category ON expenses (user, category);
+"""
+
+SELECT_ROWS = "SELECT id, date, amount, category, description FROM expenses"
+
+
+def _text(value):
+    """Category/description as stored: NULL for missing values."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return str(value)
+
+
+def _params(username, rec):
+    return (username, int(rec["id"]), rec["Date"], float(rec["Amount"]), _text(rec["Category"]), _text(rec["Description"]))
+
+
+def _month_bounds(year, month):
+    year, month = int(year), int(month)
+    end = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{end[0]:04d}-{end[1]:02d}-01"
+
+
+def _frame(rows):
+    """Ledger frame (same dtypes as the files backend) from SELECT_ROWS tuples."""
+    if not rows:
+        return empty_ledger()
+    ids, dates, amounts, categories, descriptions = zip(*rows)
+    return pd.DataFrame({
+        "ID": np.array(ids, dtype=np.int64),
+        "Date": np.array(dates, dtype="datetime64[D]").astype("datetime64[ns]"),
+        "Amount": np.array(amounts, dtype=np.float64),
+        "Category": pd.Series([np.nan if c is None else c for c in categories], dtype=object),
+        "Description": pd.Series([np.nan if d is None else d for d in descriptions], dtype=object),
+    })
+
+
+class SQLiteRollup:
+    """
+    The Rollup interface (see expense_rollup) answered by aggregate queries
+    on the indexes. Results are memoised; the store hands out a new instance
+    whenever the ledger version changes.
+    """
+
+    def __init__(self, store, username, version):
+        self.store = store
+        self.username = username
+        self.version = version
+        self._memo = {}
+
+    def _query(self, key, sql, params):
+        if key not in self._memo:
+            self._memo[key] = self.store._conn().execute(sql, params).fetchall()
+        return self._memo[key]
+
+    def _totals(self):
+        return self._query("totals", "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM expenses WHERE user = ?",
+                           (self.username,))[0]
+
+    @property
+    def total(self):
+        return float(self._totals()[0])
+
+    @property
+    def count(self):
+        return int(self._totals()[1])
+
+    def categories(self):
+        """Every category that has at least one expense, sorted."""
+        rows = self._query("categories", "SELECT DISTINCT category FROM expenses "
+                           "WHERE user = ? AND category IS NOT NULL AND category != '' ORDER BY category",
+                           (self.username,))
+        return [r[0] for r in rows]
+
+    def _month(self, year, month):
+        start, end = _month_bounds(year, month)
+        return self._query(("month", start), "SELECT COALESCE(category, ''), SUM(amount), COUNT(*) FROM expenses "
+                           "WHERE user = ? AND date >= ? AND date < ? GROUP BY 1", (self.username, start, end))
+
+    def month_total(self, year, month):
+        return sum(row[1] for row in self._month(year, month))
+
+    def month_count(self, year, month):
+        return sum(row[2] for row in self._month(year, month))
+
+    def month_categories(self, year, month):
+        """Per-category spend for one month, largest first (uncategorised rows are left out)."""
+        rows = self._month(year, month)
+        return pd.Series({c: amount for c, amount, _ in rows if c != ""}, dtype=float).sort_values(ascending=False)
+
+
+class SQLiteExpenseStore(LedgerStore):
+    """Every user's ledger in one SQLite database at `db_path`."""
+
+    def __init__(self, db_path, cache=None):
+        self.db_path = db_path
+        self.cache = cache if cache is not None else ledger_cache
+        # Same reasoning as UserStore: one connection per Streamlit thread.
+        self._local = threading.local()
+        self._known = OrderedDict()
+        self._rollups = OrderedDict()
+        self._tracked_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, username, work):
+        """
+        Run work(conn, next_id) in an immediate transaction. It returns
+        (rows_consumed_from_next_id, result); the user's version is bumped
+        in the same transaction. Returns (result, new_version).
+        """
+        self.init_user(username)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            next_id, version = conn.execute(
+                "SELECT next_id, version FROM ledgers WHERE user = ?", (username,)).fetchone()
+            used, result = work(conn, next_id)
+            conn.execute("UPDATE ledgers SET next_id = ?, version = ? WHERE user = ?",
+                         (next_id + used, version + 1, username))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result, version + 1
+
+    def _patch_cache(self, username, new_version, records):
+        """Bring the cached frame from new_version - 1 up to date with `records`, else drop it."""
+        key = self._cache_key(username)
+        with self.cache.lock_for(key):
+            entry = self.cache.get(key)
+            if entry is None:
+                return
+            if records is not None and entry.stamp == (self.db_path, new_version - 1):
+                df = ExpenseStore.replay(entry.df, records)
+                self._patch(entry, entry.df, df, sorted({int(r["id"]) for r in records}))
+                self.cache.put(key, CachedLedger(df, (self.db_path, new_version), 0, incremental=entry.incremental))
+            else:
+                self.cache.invalidate(key)
+
+    def _cache_key(self, username):
+        return ("sqlite", self.db_path, username)
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+
+    def _remember(self, tracked, username, value):
+        with self._tracked_lock:
+            tracked[username] = value
+            tracked.move_to_end(username)
+            while len(tracked) > MAX_TRACKED_USERS:
+                tracked.popitem(last=False)
+
+    def init_user(self, username):
+        if username in self._known:
+            return
+        self._conn().execute("INSERT OR IGNORE INTO ledgers (user, next_id, version) VALUES (?, 1, 0)", (username,))
+        self._remember(self._known, username, True)
+
+    def usernames(self):
+        return [r[0] for r in self._conn().execute("SELECT user FROM ledgers ORDER BY user")]
+
+    def version(self, username):
+        """Opaque token that changes whenever the user's ledger changes."""
+        self.init_user(username)
+        row = self._conn().execute("SELECT version FROM ledgers WHERE user = ?", (username,)).fetchone()
+        return (self.db_path, row[0])
+
+    def read(self, username):
+        """
+        Return the user's ledger in ID order. Like ExpenseStore.read, the frame
+        is shared through the ledger cache and must not be modified in place.
+        """
+        key = self._cache_key(username)
+        stamp = self.version(username)
+        entry = self.cache.get(key)
+        if entry is not None and entry.stamp == stamp:
+            return entry.df
+        with self.cache.lock_for(key):
+            entry = self.cache.get(key)
+            if entry is not None and entry.stamp == stamp:
+                return entry.df
+            conn = self._conn()
+            # One read transaction, so the rows match the version they're cached under.
+            conn.execute("BEGIN")
+            try:
+                stamp = (self.db_path, conn.execute(
+                    "SELECT version FROM ledgers WHERE user = ?", (username,)).fetchone()[0])
+                df = _frame(conn.execute(SELECT_ROWS + " WHERE user = ? ORDER BY id", (username,)).fetchall())
+            finally:
+                conn.execute("COMMIT")
+            self.cache.put(key, CachedLedger(df, stamp, 0))
+        return df
+
+    def month(self, username, year, month):
+        """The user's expenses dated in year-month, newest first (a (user, date) range scan)."""
+        start, end = _month_bounds(year, month)
+        rows = self._conn().execute(
+            SELECT_ROWS + " WHERE user = ? AND date >= ? AND date < ? ORDER BY date DESC, id DESC",
+            (username, start, end)).fetchall()
+        return _frame(rows)
+
+    def rollup(self, username):
+        """Month/category aggregates for the current ledger version, as SQL queries."""
+        version = self.version(username)
+        rollup = self._rollups.get(username)
+        if rollup is None or rollup.version != version:
+            rollup = SQLiteRollup(self, username, version)
+        self._remember(self._rollups, username, rollup)
+        return rollup
+
+    def get(self, username, expense_id):
+        rows = self._conn().execute(SELECT_ROWS + " WHERE user = ? AND id = ?", (username, int(expense_id))).fetchall()
+        return _frame(rows).iloc[0] if rows else None
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+
+    def add(self, username, date, amount, category, description):
+        rec = {"op": "add"}
+        rec.update(record_values(date, amount, category, description))
+
+        def work(conn, next_id):
+            rec["id"] = next_id
+            conn.execute("INSERT INTO expenses VALUES (?, ?, ?, ?, ?, ?)", _params(username, rec))
+            return 1, next_id
+
+        eid, version = self._write(username, work)
+        self._patch_cache(username, version, [rec])
+        return eid
+
+    def add_many(self, username, rows):
+        """Insert every row of `rows` (Date, Amount, Category, Description) in one transaction; returns the new IDs."""
+        rows = rows[VALUE_COLUMNS].reset_index(drop=True)
+        if rows.empty:
+            return np.empty(0, dtype=np.int64)
+        records = rows.assign(op="add", Date=pd.to_datetime(rows["Date"]).dt.strftime("%Y-%m-%d")).to_dict("records")
+
+        def work(conn, next_id):
+            for i, rec in enumerate(records):
+                rec["id"] = next_id + i
+            conn.executemany("INSERT INTO expenses VALUES (?, ?, ?, ?, ?, ?)", (_params(username, r) for r in records))
+            return len(records), np.arange(next_id, next_id + len(records), dtype=np.int64)
+
+        ids, version = self._write(username, work)
+        # Big batches are cheaper to reload than to replay, as with the journal.
+        small = len(records) * JOURNAL_BYTES_PER_ROW < COMPACT_BYTES
+        self._patch_cache(username, version, records if small else None)
+        return ids
+
+    def _checked(self, conn, username, expense_id, expected_version):
+        row = conn.execute(SELECT_ROWS + " WHERE user = ? AND id = ?", (username, int(expense_id))).fetchall()
+        self._check_row(_frame(row).iloc[0] if row else None, expected_version)
+
+    def edit(self, username, expense_id, date, amount, category, description, expected_version=None):
+        """Replace an expense's values; raises ConflictError like ExpenseStore.edit."""
+        rec = {"op": "edit", "id": int(expense_id)}
+        rec.update(record_values(date, amount, category, description))
+
+        def work(conn, next_id):
+            self._checked(conn, username, expense_id, expected_version)
+            conn.execute("UPDATE expenses SET date = ?, amount = ?, category = ?, description = ? WHERE user = ? AND id = ?",
+                         _params(username, rec)[2:] + (username, rec["id"]))
+            return 0, None
+
+        _, version = self._write(username, work)
+        self._patch_cache(username, version, [rec])
+
+    def delete(self, username, expense_id, expected_version=None):
+        """Delete an expense, with the same optional optimistic check as edit."""
+        def work(conn, next_id):
+            self._checked(conn, username, expense_id, expected_version)
+            conn.execute("DELETE FROM expenses WHERE user = ? AND id = ?", (username, int(expense_id)))
+            return 0, None
+
+        _, version = self._write(username, work)
+        self._patch_cache(username, version, [{"op": "delete", "id": int(expense_id)}])
+
+    def save(self, username, df):
+        """Replace the user's whole ledger with `df` (assigning IDs where missing)."""
+        df = df.copy()
+        if "ID" not in df.columns:
+            df["ID"] = pd.NA
+
+        def work(conn, next_id):
+            missing = df["ID"].isna()
+            df.loc[missing, "ID"] = range(next_id, next_id + int(missing.sum()))
+            df["ID"] = df["ID"].astype("int64")
+            if df["ID"].duplicated().any():
+                raise ValueError("Expense IDs must be unique.")
+            records = df[COLUMNS].astype(LEDGER_DTYPES).assign(
+                Date=lambda d: d["Date"].dt.strftime("%Y-%m-%d")).rename(columns={"ID": "id"}).to_dict("records")
+            conn.execute("DELETE FROM expenses WHERE user = ?", (username,))
+            conn.executemany("INSERT INTO expenses VALUES (?, ?, ?, ?, ?, ?)", (_params(username, r) for r in records))
+            top = int(df["ID"].max()) + 1 if not df.empty else 1
+            return max(next_id, top) - next_id, None
+
+        self._write(username, work)
+        self.cache.invalidate(self._cache_key(username))
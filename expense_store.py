@@ -0,0 +1,961 @@
+# expense_store.py
+"""
+Per-user expense storage used by app.py (the "files" backend, see
+expense_backends).
+
+Each user has a columnar snapshot (`<user>_expenses.npz`) plus an
+append-only journal of change records. Adding, editing or deleting an expense
+appends one JSON line to the journal instead of rewriting the whole CSV; once
+the journal grows past COMPACT_BYTES it is folded back into the snapshot.
+Reads load the snapshot and replay only the journal tail.
+
+Writers hold an advisory fcntl lock on `<user>_expenses.lock`, snapshots are
+written to a temp file and swapped in with os.replace, and edits/deletes can
+carry the row version the caller saw so concurrent changes from another tab
+or server process are rejected instead of silently overwritten.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks apply
+    fcntl = None
+
+from expense_index import LedgerIndex, locate
+from expense_rollup import Rollup
+
+COLUMNS = ["ID", "Date", "Amount", "Category", "Description"]
+VALUE_COLUMNS = ["Date", "Amount", "Category", "Description"]
+# Text stays as plain object columns, the same as read_npz_ledger produces.
+LEDGER_DTYPES = {"ID": "int64", "Date": "datetime64[ns]", "Amount": "float64", "Category": object, "Description": object}
+TEXT_COLUMNS = ["Category", "Description"]
+
+# Journal size (bytes) after which a mutation triggers compaction.
+COMPACT_BYTES = 256 * 1024
+# Rough size of one journalled add, used to route big batches to the snapshot.
+JOURNAL_BYTES_PER_ROW = 100
+
+
+def empty_ledger():
+    return pd.DataFrame(columns=COLUMNS).astype(LEDGER_DTYPES)
+
+
+def record_values(date, amount, category, description):
+    """An expense's values as a journal record stores them (ISO date, float amount)."""
+    return {
+        "Date": pd.to_datetime(date).date().isoformat(),
+        "Amount": float(amount),
+        "Category": category,
+        "Description": description,
+    }
+
+
+class ConflictError(Exception):
+    """An edit or delete targeted an expense that changed since the caller read it."""
+
+
+def row_version(date, amount, category, description):
+    """Short fingerprint of an expense's values, used for optimistic edit/delete checks."""
+    values = record_values(date, amount, category, description)
+    for key in ("Category", "Description"):
+        if values[key] is not None and pd.isna(values[key]):
+            values[key] = None
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+# ---------------------------
+# Locking / atomic writes
+# ---------------------------
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on `path` (created if needed)."""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path, write):
+    """Call write(f) on a temp file next to `path`, fsync it, then os.replace it into place."""
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# ---------------------------
+# On-disk formats
+# ---------------------------
+#
+# Snapshots are uncompressed .npz archives holding one array per column:
+#   id        int64
+#   date      int32 days since 1970-01-01
+#   amount    float64
+#   category / description  dictionary encoded: int32 codes (-1 = missing)
+#             plus the distinct values as one UTF-8 blob with int64 offsets.
+# Nothing is pickled, so np.load runs with allow_pickle=False.
+
+FORMAT_VERSION = 1
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def encode_strings(values):
+    """
+    Dictionary-encode text as (int32 codes with -1 for missing, UTF-8 blob of
+    the distinct values, int64 offsets into it), the layout snapshots and
+    expense_batch summaries store.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    try:
+        joined = "\0".join(uniques)
+    except TypeError:  # non-string values
+        joined = "\0".join(str(u) for u in uniques)
+    buf = np.frombuffer(joined.encode("utf-8"), dtype=np.uint8)
+    separators = np.flatnonzero(buf == 0)
+    offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+    if len(separators) == max(len(uniques) - 1, 0):
+        # Every value encoded in one call; the NULs between them give the offsets.
+        offsets[1:-1] = separators - np.arange(len(separators))
+        offsets[-1] = len(buf) - len(separators)
+        return codes.astype(np.int32), buf[buf != 0], offsets
+    # Some value contains a NUL itself: encode them one by one.
+    encoded = [str(u).encode("utf-8") for u in uniques]
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return codes.astype(np.int32), np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _string_table(blob, offsets):
+    """The distinct values behind a blob/offsets pair, as an object array."""
+    table = np.empty(len(offsets) - 1, dtype=object)
+    if len(table) and not np.count_nonzero(blob == 0):
+        # Put a NUL between values, then decode and split the whole blob in
+        # one call each instead of decoding every value from Python.
+        table[:] = np.insert(blob, offsets[1:-1], 0).tobytes().decode("utf-8").split("\0")
+    elif len(table):
+        raw = blob.tobytes()
+        table[:] = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(table))]
+    return table
+
+
+def decode_strings(codes, blob, offsets):
+    """Inverse of encode_strings: an object array with NaN for missing values."""
+    if len(codes) == len(offsets) - 1 and np.array_equal(codes, np.arange(len(codes))):
+        # Every value distinct and present (typical for descriptions): the table is the column.
+        return _string_table(blob, offsets)
+    # Last slot is the missing-value marker so code -1 maps to NaN in one take.
+    table = np.empty(len(offsets), dtype=object)
+    table[:-1] = _string_table(blob, offsets)
+    table[-1] = np.nan
+    return table[codes]
+
+
+def write_npz_ledger(path, df):
+    df = df[COLUMNS]
+    days = (pd.to_datetime(df["Date"]).values.astype("datetime64[D]") - EPOCH).astype(np.int32)
+    cat_codes, cat_blob, cat_offsets = encode_strings(df["Category"])
+    desc_codes, desc_blob, desc_offsets = encode_strings(df["Description"])
+    # Write through a file object so numpy doesn't append a second ".npz" suffix.
+    atomic_write(path, lambda f: np.savez(
+        f,
+        format_version=np.array([FORMAT_VERSION], dtype=np.int32),
+        id=df["ID"].to_numpy(dtype=np.int64),
+        date=days,
+        amount=df["Amount"].to_numpy(dtype=np.float64),
+        category_codes=cat_codes,
+        category_blob=cat_blob,
+        category_offsets=cat_offsets,
+        description_codes=desc_codes,
+        description_blob=desc_blob,
+        description_offsets=desc_offsets,
+    ))
+
+
+def _by_id(df):
+    """Ledgers are kept in ascending ID order so IDs can be found by binary search."""
+    ids = df["ID"].to_numpy()
+    if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+        df = df.sort_values("ID", kind="stable").reset_index(drop=True)
+    return df
+
+
+def read_npz_ledger(path):
+    with np.load(path, allow_pickle=False) as z:
+        if int(z["format_version"][0]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ledger format in {path}")
+        dates = (z["date"].astype("datetime64[D]")).astype("datetime64[ns]")
+        # Explicit object dtype: letting pandas infer a string dtype costs
+        # more than the whole load.
+        return _by_id(pd.DataFrame({
+            "ID": z["id"],
+            "Date": dates,
+            "Amount": z["amount"],
+            "Category": pd.Series(decode_strings(z["category_codes"], z["category_blob"], z["category_offsets"]), dtype=object),
+            "Description": pd.Series(decode_strings(z["description_codes"], z["description_blob"], z["description_offsets"]), dtype=object),
+        }))
+
+
+def read_npz_categories(path):
+    """
+    (days since epoch, amount, category codes, category values) from a
+    snapshot, without decoding strings per row or building a frame. Code -1
+    marks a missing category. Used by batch jobs that only aggregate.
+    """
+    with np.load(path, allow_pickle=False) as z:
+        if int(z["format_version"][0]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ledger format in {path}")
+        return z["date"], z["amount"], z["category_codes"], _string_table(z["category_blob"], z["category_offsets"])
+
+
+def read_csv_ledger(path):
+    """Read a CSV ledger, numbering rows when the file predates expense IDs."""
+    df = pd.read_csv(path, parse_dates=["Date"], dayfirst=False)
+    if "ID" not in df.columns:
+        df.insert(0, "ID", range(1, len(df) + 1))
+    df["ID"] = df["ID"].astype("int64")
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Amount"] = df["Amount"].astype("float64")
+    return _by_id(df[COLUMNS])
+
+
+def write_csv_ledger(path, df):
+    df = df[COLUMNS].copy()
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    atomic_write(path, lambda f: f.write(df.to_csv(index=False).encode("utf-8")))
+
+
+# ---------------------------
+# Process-wide ledger cache
+# ---------------------------
+#
+# Streamlit re-executes app.py on every interaction but imports this module
+# only once per server process, so a module-level cache is shared by every
+# rerun and every session. Entries are validated against the snapshot's
+# stat() identity and the journal length, and evicted least-recently-used
+# once their estimated size passes EXPENSE_CACHE_MB.
+
+CACHE_BYTES = int(os.environ.get("EXPENSE_CACHE_MB", "512")) * 1024 * 1024
+
+
+def frame_bytes(df, sample=1000):
+    """Approximate deep memory use of `df` without scanning every string."""
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    n = len(df)
+    if n == 0:
+        return total
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col].iloc[:: max(1, n // sample)]
+            total += int(sum(sys.getsizeof(v) for v in values) / len(values) * n)
+    return total
+
+
+class CachedLedger:
+    def __init__(self, df, stamp, offset, rollup=None, incremental=None):
+        self.df = df
+        self.stamp = stamp
+        self.offset = offset
+        # Built on first use by ExpenseStore.rollup, then patched on replay.
+        self.rollup = rollup
+        # name -> structure with apply(old_rows, new_rows), patched like the rollup (LedgerStore.incremental).
+        # Copied, so a structure built late for the entry this one replaced can't land here.
+        self.incremental = dict(incremental) if incremental else {}
+        # name -> read-only structure built from exactly this frame (ExpenseStore.derived).
+        self.derived = {}
+        self.frame_nbytes = frame_bytes(df)
+        self.nbytes = self.measure()
+
+    def measure(self):
+        """Estimated bytes held: the frame plus any incremental structures that report nbytes."""
+        return self.frame_nbytes + sum(getattr(v, "nbytes", 0) for v in list(self.incremental.values()))
+
+
+class LedgerCache:
+    """Thread-safe LRU of CachedLedger entries bounded by total estimated bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+            self._entries[key] = entry
+            self.total_bytes += entry.nbytes
+            self._evict()
+
+    def resize(self, key, entry):
+        """Re-measure `entry` after something was added to it, if it is still cached under `key`."""
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            self.total_bytes -= entry.nbytes
+            entry.nbytes = entry.measure()
+            self.total_bytes += entry.nbytes
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone is over budget.
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.nbytes
+
+    def lock_for(self, key):
+        """Per-key lock serialising loads and refreshes of one ledger."""
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.RLock()
+            return lock
+
+    def invalidate(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+ledger_cache = LedgerCache()
+
+
+class LedgerStore:
+    """
+    Interface shared by the ledger backends (see expense_backends).
+
+    A backend provides init_user, read, version, rollup, add, add_many, edit,
+    delete, save and usernames, and names its entry in the process-wide
+    ledger cache with _cache_key. The lookups below are built on those.
+    """
+
+    def _cache_key(self, username):
+        raise NotImplementedError
+
+    def _current_entry(self, username):
+        """(ledger, its cache entry) - the entry is None if the cache couldn't keep the ledger."""
+        df = self.read(username)
+        entry = self.cache.get(self._cache_key(username))
+        return df, (entry if entry is not None and entry.df is df else None)
+
+    def derived(self, username, name, build):
+        """
+        Return build(ledger) for the user's current ledger, cached with it
+        until the next change. For read-only views: indexes, hash sets, etc.
+        """
+        df, entry = self._current_entry(username)
+        if entry is None:
+            return build(df)
+        value = entry.derived.get(name)
+        if value is None:
+            with self.cache.lock_for(self._cache_key(username)):
+                value = entry.derived.get(name)
+                if value is None:
+                    value = entry.derived[name] = build(df)
+        return value
+
+    def incremental(self, username, name, build):
+        """
+        Like derived, for structures with an apply(old_rows, new_rows) method
+        (see Rollup): built once, then kept across changes and patched with
+        just the rows each change touched.
+        """
+        df, entry = self._current_entry(username)
+        if entry is None:
+            return build(df)
+        value = entry.incremental.get(name)
+        if value is None:
+            key = self._cache_key(username)
+            with self.cache.lock_for(key):
+                value = entry.incremental.get(name)
+                if value is None:
+                    value = build(df)
+                    # Only keep it if no refresh replaced the entry meanwhile;
+                    # a replaced entry's structures are no longer patched.
+                    if self.cache.get(key) is entry:
+                        entry.incremental[name] = value
+                        self.cache.resize(key, entry)
+        return value
+
+    @staticmethod
+    def _patch(entry, old_df, new_df, touched):
+        """Bring entry's rollup and incremental structures from old_df to new_df (same IDs `touched`)."""
+        old_rows, new_rows = LedgerStore.rows(old_df, touched), LedgerStore.rows(new_df, touched)
+        if entry.rollup is not None:
+            entry.rollup.apply(old_rows, new_rows)
+        for value in entry.incremental.values():
+            value.apply(old_rows, new_rows)
+
+    def index(self, username):
+        """Return the newest-first LedgerIndex for the user's current ledger."""
+        return self.derived(username, "index", LedgerIndex)
+
+    def month(self, username, year, month):
+        """The user's expenses dated in year-month, newest first."""
+        df = self.read(username)
+        index = self.index(username)
+        start = pd.Timestamp(year=int(year), month=int(month), day=1)
+        lo, hi = index.date_slice(start, start + pd.offsets.MonthEnd(0))
+        return df.iloc[index.order[lo:hi]]
+
+    @staticmethod
+    def rows(df, expense_ids):
+        """Rows of `df` with the given IDs (missing IDs are skipped)."""
+        positions = locate(df["ID"].to_numpy(), expense_ids)
+        return df.iloc[positions[positions >= 0]]
+
+    def get(self, username, expense_id):
+        """Return the expense with `expense_id` as a Series, or None if it doesn't exist."""
+        row = self.rows(self.read(username), [int(expense_id)])
+        return row.iloc[0] if len(row) else None
+
+    @staticmethod
+    def _check_row(r, expected_version):
+        if r is None:
+            raise ConflictError("This expense was deleted in another session.")
+        if expected_version is not None and row_version(r["Date"], r["Amount"], r["Category"], r["Description"]) != expected_version:
+            raise ConflictError("This expense was changed in another session. Reload and try again.")
+
+    def import_csv(self, username, path):
+        """Replace the user's ledger with the contents of a CSV file."""
+        self.save(username, read_csv_ledger(path))
+
+    def export_csv(self, username, path):
+        """Write the user's current ledger to `path` as CSV (same layout as the legacy files)."""
+        write_csv_ledger(path, self.read(username))
+
+
+class ExpenseStore(LedgerStore):
+    """Snapshot + journal storage for every user under `data_dir`."""
+
+    def __init__(self, data_dir, compact_bytes=COMPACT_BYTES, cache=None):
+        self.data_dir = data_dir
+        self.compact_bytes = compact_bytes
+        self.cache = cache if cache is not None else ledger_cache
+        self._held = threading.local()
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+
+    # ---------------------------
+    # Paths
+    # ---------------------------
+
+    def _base(self, username):
+        safe = username.replace(" ", "_")
+        return os.path.join(self.data_dir, f"{safe}_expenses")
+
+    def snapshot_path(self, username):
+        return self._base(username) + ".npz"
+
+    def csv_path(self, username):
+        return self._base(username) + ".csv"
+
+    def journal_path(self, username):
+        return self._base(username) + ".journal"
+
+    def seq_path(self, username):
+        return self._base(username) + ".seq"
+
+    def lock_path(self, username):
+        return self._base(username) + ".lock"
+
+    def _cache_key(self, username):
+        return self.snapshot_path(username)
+
+    def usernames(self):
+        """Every user with a ledger (or a legacy CSV) under data_dir, as stored on disk."""
+        names = set()
+        for name in os.listdir(self.data_dir):
+            for suffix in ("_expenses.npz", "_expenses.csv"):
+                if name.endswith(suffix):
+                    names.add(name[: -len(suffix)])
+        return sorted(names)
+
+    @contextmanager
+    def locked(self, username):
+        """Hold the user's write lock; re-entrant within a thread (compaction runs inside appends)."""
+        held = self._held.__dict__.setdefault("paths", set())
+        path = self.lock_path(username)
+        if path in held:
+            yield
+            return
+        with file_lock(path):
+            held.add(path)
+            try:
+                yield
+            finally:
+                held.discard(path)
+
+    # ---------------------------
+    # Snapshot / journal I/O
+    # ---------------------------
+
+    def init_user(self, username):
+        """Create an empty ledger for `username`, migrating a legacy CSV if present."""
+        if os.path.exists(self.snapshot_path(username)):
+            return
+        with self.locked(username):
+            if os.path.exists(self.snapshot_path(username)):
+                return  # created by another process while we waited
+            if os.path.exists(self.csv_path(username)):
+                self.migrate_csv(username)
+            else:
+                self._write_seq(username, 1)
+                self._write_snapshot(username, empty_ledger())
+
+    def migrate_csv(self, username):
+        """Convert `<user>_expenses.csv` to the columnar snapshot, keeping the CSV as .bak."""
+        with self.locked(username):
+            df = read_csv_ledger(self.csv_path(username))
+            next_id = int(df["ID"].max()) + 1 if not df.empty else 1
+            if os.path.exists(self.seq_path(username)):
+                next_id = max(next_id, self._read_seq(username))
+            self._write_seq(username, next_id)
+            self._write_snapshot(username, df)
+            os.replace(self.csv_path(username), self.csv_path(username) + ".bak")
+        return len(df)
+
+    def migrate_all(self):
+        """Migrate every legacy CSV ledger under data_dir; returns {username: rows}."""
+        migrated = {}
+        for name in sorted(os.listdir(self.data_dir)):
+            if not name.endswith("_expenses.csv"):
+                continue
+            username = name[: -len("_expenses.csv")]
+            if not os.path.exists(self.snapshot_path(username)):
+                migrated[username] = self.migrate_csv(username)
+        return migrated
+
+    def _read_snapshot(self, username):
+        return read_npz_ledger(self.snapshot_path(username))
+
+    def _write_snapshot(self, username, df):
+        write_npz_ledger(self.snapshot_path(username), df)
+
+    def _read_seq(self, username):
+        with open(self.seq_path(username)) as f:
+            return int(f.read().strip() or 1)
+
+    def _write_seq(self, username, value):
+        atomic_write(self.seq_path(username), lambda f: f.write(str(value).encode("ascii")))
+
+    def _next_id(self, username):
+        # Caller holds the user's lock.
+        next_id = self._read_seq(username)
+        self._write_seq(username, next_id + 1)
+        return next_id
+
+    def _read_journal(self, username, offset=0):
+        """Return (records, end_offset) for journal lines starting at byte `offset`."""
+        fn = self.journal_path(username)
+        if not os.path.exists(fn):
+            return [], 0
+        records = []
+        with open(fn, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A torn final line from an interrupted append; the
+                    # change never completed, so ignore it.
+                    break
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+        return records, offset
+
+    def _append(self, username, records):
+        # Caller holds the user's lock. One write() of whole lines, fsynced,
+        # so a crash leaves at most a torn last line that replay ignores.
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with open(self.journal_path(username), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if size >= self.compact_bytes:
+            self.compact(username)
+
+    # ---------------------------
+    # Replay
+    # ---------------------------
+
+    @staticmethod
+    def replay(df, records):
+        """
+        Apply journal `records` to ledger frame `df` and return the result.
+
+        `df` is never modified (it may be the shared cached frame). Edited and
+        deleted rows are found by binary search on the ascending ID column.
+        """
+        if not records:
+            return df
+        changes = {}  # id -> latest add/edit record, or None once deleted
+        added = set()
+        for rec in records:
+            eid = int(rec["id"])
+            op = rec["op"]
+            if op == "delete":
+                changes[eid] = None
+            elif op == "add":
+                changes[eid] = rec
+                added.add(eid)
+            elif op == "edit" and changes.get(eid, rec) is not None:
+                changes[eid] = rec
+
+        keys = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        positions = locate(df["ID"].to_numpy(), keys)
+        updated_pos, updated, deleted_pos, new = [], [], [], []
+        for eid, pos in zip(keys.tolist(), positions.tolist()):
+            rec = changes[eid]
+            if pos >= 0:
+                # Includes adds already folded into the snapshot by a
+                # compaction that was interrupted before clearing the journal.
+                if rec is None:
+                    deleted_pos.append(pos)
+                else:
+                    updated_pos.append(pos)
+                    updated.append(rec)
+            elif rec is not None and eid in added:
+                new.append(rec)
+
+        df = df.copy()
+        if updated:
+            upd = ExpenseStore._record_frame(updated)
+            for col in VALUE_COLUMNS:
+                df.iloc[updated_pos, df.columns.get_loc(col)] = upd[col].to_numpy()
+        if deleted_pos:
+            keep = np.ones(len(df), dtype=bool)
+            keep[deleted_pos] = False
+            df = df[keep]
+        if new:
+            new_df = ExpenseStore._record_frame(new)
+            new_df["ID"] = new_df["id"].astype("int64")
+            new_df = new_df.sort_values("ID")[COLUMNS].astype(LEDGER_DTYPES)
+            df = pd.concat([df, new_df], ignore_index=True) if len(df) else new_df
+        return df[COLUMNS].reset_index(drop=True).astype(LEDGER_DTYPES)
+
+    @staticmethod
+    def _record_frame(records):
+        """Journal records as a frame, with missing text as NaN like snapshot rows (records hold None)."""
+        frame = pd.DataFrame(records)
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        for col in TEXT_COLUMNS:
+            frame[col] = frame[col].astype(object).where(frame[col].notna(), np.nan)
+        return frame
+
+    def read_uncached(self, username):
+        """
+        The user's current ledger straight from disk, without migrating a
+        legacy CSV, taking the lock or touching the cache (for batch readers).
+        """
+        if os.path.exists(self.snapshot_path(username)):
+            records, _ = self._read_journal(username)
+            return self.replay(self._read_snapshot(username), records)
+        if os.path.exists(self.csv_path(username)):
+            return read_csv_ledger(self.csv_path(username))
+        return empty_ledger()
+
+    def _stamp(self, username):
+        """Identity of the snapshot currently on disk (changes on every compaction)."""
+        st = os.stat(self.snapshot_path(username))
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _journal_size(self, username):
+        try:
+            return os.path.getsize(self.journal_path(username))
+        except FileNotFoundError:
+            return 0
+
+    def read(self, username):
+        """
+        Return the user's current ledger (snapshot + journal tail).
+
+        The frame is shared through the process-wide cache and must not be
+        modified in place; copy it first if you need to.
+        """
+        self.init_user(username)
+        key = self.snapshot_path(username)
+        stamp = self._stamp(username)
+        entry = self.cache.get(key)
+        if entry is not None and entry.stamp == stamp and self._journal_size(username) == entry.offset:
+            return entry.df
+        with self.cache.lock_for(key):
+            # Re-check: another thread may have refreshed it while we waited.
+            entry = self.cache.get(key)
+            if entry is not None and entry.stamp == stamp:
+                if self._journal_size(username) == entry.offset:
+                    return entry.df
+                # Another mutation (from this or another process) appended to
+                # the journal: replay just the bytes we haven't seen.
+                records, offset = self._read_journal(username, entry.offset)
+                df = self.replay(entry.df, records)
+                if records:
+                    self._patch(entry, entry.df, df, sorted({int(r["id"]) for r in records}))
+                rollup, incremental = entry.rollup, entry.incremental
+            else:
+                records, offset = self._read_journal(username)
+                df = self.replay(self._read_snapshot(username), records)
+                rollup, incremental = None, None
+            self.cache.put(key, CachedLedger(df, stamp, offset, rollup, incremental))
+        return df
+
+    def version(self, username):
+        """Opaque token that changes whenever the user's ledger changes."""
+        self.init_user(username)
+        return self._stamp(username) + (self._journal_size(username),)
+
+    def rollup(self, username):
+        """Return the user's month x category aggregate index (see expense_rollup)."""
+        df, entry = self._current_entry(username)
+        if entry is None:
+            return Rollup.from_frame(df)
+        if entry.rollup is None:
+            with self.cache.lock_for(self.snapshot_path(username)):
+                if entry.rollup is None:
+                    entry.rollup = Rollup.from_frame(df)
+        return entry.rollup
+
+    def _check_version(self, username, expense_id, expected_version):
+        self._check_row(self.get(username, expense_id), expected_version)
+
+    def add(self, username, date, amount, category, description):
+        self.init_user(username)
+        rec = {"op": "add"}
+        rec.update(record_values(date, amount, category, description))
+        with self.locked(username):
+            rec["id"] = eid = self._next_id(username)
+            self._append(username, [rec])
+        return eid
+
+    def add_many(self, username, rows):
+        """
+        Add every row of `rows` (Date, Amount, Category, Description) under one
+        lock and return the new IDs. Small batches go to the journal in a single
+        append; batches that would overflow it are merged straight into a new
+        snapshot instead of being journalled and then compacted.
+        """
+        self.init_user(username)
+        rows = rows[VALUE_COLUMNS].reset_index(drop=True)
+        if rows.empty:
+            return np.empty(0, dtype=np.int64)
+        with self.locked(username):
+            start = self._read_seq(username)
+            ids = np.arange(start, start + len(rows), dtype=np.int64)
+            self._write_seq(username, start + len(rows))
+            new = rows.assign(ID=ids)[COLUMNS].astype(LEDGER_DTYPES)
+            if len(new) * JOURNAL_BYTES_PER_ROW < self.compact_bytes:
+                records = new.assign(op="add", Date=new["Date"].dt.strftime("%Y-%m-%d")).rename(columns={"ID": "id"})
+                self._append(username, records.to_dict("records"))
+            else:
+                df, entry = self._current_entry(username)
+                merged = pd.concat([df, new], ignore_index=True) if len(df) else new
+                self._write_snapshot(username, merged)
+                if os.path.exists(self.journal_path(username)):
+                    os.remove(self.journal_path(username))
+                rollup, incremental = None, None
+                if entry is not None:
+                    self._patch(entry, df, merged, new["ID"].to_numpy())
+                    rollup, incremental = entry.rollup, entry.incremental
+                self.cache.put(self.snapshot_path(username), CachedLedger(merged, self._stamp(username), 0, rollup, incremental))
+        return ids
+
+    def edit(self, username, expense_id, date, amount, category, description, expected_version=None):
+        """
+        Replace an expense's values. Raises ConflictError if the expense no
+        longer exists, or if `expected_version` (see row_version) is given and
+        the stored row no longer matches it.
+        """
+        self.init_user(username)
+        rec = {"op": "edit", "id": int(expense_id)}
+        rec.update(record_values(date, amount, category, description))
+        with self.locked(username):
+            self._check_version(username, expense_id, expected_version)
+            self._append(username, [rec])
+
+    def delete(self, username, expense_id, expected_version=None):
+        """Delete an expense, with the same optional optimistic check as edit."""
+        self.init_user(username)
+        with self.locked(username):
+            self._check_version(username, expense_id, expected_version)
+            self._append(username, [{"op": "delete", "id": int(expense_id)}])
+
+    def save(self, username, df):
+        """Replace the user's whole ledger with `df` (assigning IDs where missing)."""
+        self.init_user(username)
+        df = df.copy()
+        if "ID" not in df.columns:
+            df["ID"] = pd.NA
+        with self.locked(username):
+            missing = df["ID"].isna()
+            if missing.any():
+                start = self._read_seq(username)
+                df.loc[missing, "ID"] = range(start, start + int(missing.sum()))
+            df["ID"] = df["ID"].astype("int64")
+            if df["ID"].duplicated().any():
+                raise ValueError("Expense IDs must be unique.")
+            df = df.sort_values("ID", kind="stable")
+            self._write_seq(username, max(self._read_seq(username), int(df["ID"].max()) + 1 if not df.empty else 1))
+            self._write_snapshot(username, df)
+            if os.path.exists(self.journal_path(username)):
+                os.remove(self.journal_path(username))
+        self.cache.invalidate(self.snapshot_path(username))
+
+    def compact(self, username):
+        """Fold the journal into the snapshot and start a fresh journal."""
+        with self.locked(username):
+            df = self.read(username)
+            entry = self.cache.get(self.snapshot_path(username))
+            # The new snapshot already contains every journal record, so a
+            # crash between these two steps only means a harmless re-replay.
+            self._write_snapshot(username, df)
+            if os.path.exists(self.journal_path(username)):
+                os.remove(self.journal_path(username))
+            same = entry is not None and entry.df is df
+            self.cache.put(self.snapshot_path(username), CachedLedger(
+                df, self._stamp(username), 0, entry.rollup if same else None, entry.incremental if same else None))
+        return df
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def _check_writer(data_dir, worker, rows, compact_bytes):
+    """One `check` process: add `rows` expenses through its own store and cache."""
+    store = ExpenseStore(data_dir, compact_bytes=compact_bytes, cache=LedgerCache())
+    for i in range(rows):
+        store.add("check", "2026-01-01", 1 + i, "Check", f"w{worker}-{i}")
+
+
+def run_checks(processes=6, rows=50, compact_bytes=2048):
+    """
+    Exercise the write lock, atomic snapshot replace and optimistic checks in
+    a scratch directory: `processes` writers each add `rows` expenses while a
+    small `compact_bytes` forces compactions mid-run, then stale edits and
+    deletes must raise ConflictError. Raises AssertionError on a failure.
+    """
+    import multiprocessing
+    import shutil
+    import tempfile
+
+    data_dir = tempfile.mkdtemp(prefix="expense_check_")
+    try:
+        workers = [multiprocessing.Process(target=_check_writer, args=(data_dir, w, rows, compact_bytes))
+                   for w in range(processes)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+            assert p.exitcode == 0, f"writer exited with {p.exitcode}"
+        store = ExpenseStore(data_dir, compact_bytes=compact_bytes, cache=LedgerCache())
+        df = store.read("check")
+        expected = {f"w{w}-{i}" for w in range(processes) for i in range(rows)}
+        assert len(df) == processes * rows, f"{len(df)} rows, expected {processes * rows}"
+        assert df["ID"].is_unique, "duplicate expense IDs"
+        assert set(df["Description"]) == expected, "rows lost or duplicated"
+
+        row = store.get("check", int(df["ID"].iloc[0]))
+        seen = row_version(row["Date"], row["Amount"], row["Category"], row["Description"])
+        store.edit("check", row["ID"], row["Date"], row["Amount"] + 1, row["Category"], row["Description"])  # another tab
+        for stale in (lambda: store.edit("check", row["ID"], row["Date"], 5, "Check", "stale", expected_version=seen),
+                      lambda: store.delete("check", row["ID"], expected_version=seen)):
+            try:
+                stale()
+            except ConflictError:
+                pass
+            else:
+                raise AssertionError("a stale edit/delete was not rejected")
+        current = store.get("check", row["ID"])
+        store.delete("check", row["ID"], expected_version=row_version(
+            current["Date"], current["Amount"], current["Category"], current["Description"]))
+        try:
+            store.edit("check", row["ID"], row["Date"], 5, "Check", "gone")
+        except ConflictError:
+            pass
+        else:
+            raise AssertionError("editing a deleted expense was not rejected")
+        assert len(store.read("check")) == processes * rows - 1
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Maintenance for per-user expense ledgers.")
+    parser.add_argument("--data-dir", default=os.path.join(os.getcwd(), "user_data"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="convert every legacy <user>_expenses.csv to .npz")
+    p_exp = sub.add_parser("export", help="write a user's ledger as CSV")
+    p_exp.add_argument("username")
+    p_exp.add_argument("path")
+    p_imp = sub.add_parser("import", help="replace a user's ledger with a CSV file")
+    p_imp.add_argument("username")
+    p_imp.add_argument("path")
+    p_chk = sub.add_parser("check", help="check concurrent writers and conflict detection in a scratch directory")
+    p_chk.add_argument("--processes", type=int, default=6)
+    p_chk.add_argument("--rows", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        start = time.perf_counter()
+        run_checks(args.processes, args.rows)
+        print(f"{args.processes} processes x {args.rows} rows and conflict checks passed "
+              f"in {time.perf_counter() - start:.2f}s")
+        return
+    store = ExpenseStore(args.data_dir)
+    if args.command == "migrate":
+        start = time.perf_counter()
+        migrated = store.migrate_all()
+        for username, rows in migrated.items():
+            print(f"{username}: {rows} rows")
+        print(f"Migrated {len(migrated)} ledgers in {time.perf_counter() - start:.2f}s")
+    elif args.command == "export":
+        store.export_csv(args.username, args.path)
+    elif args.command == "import":
+        store.import_csv(args.username, args.path)
+
+
+if __name__ == "__main__":
+    main()
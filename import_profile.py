@@ -0,0 +1,86 @@
+# import_profile.py
+"""
+Import-time report for the Streamlit entry points.
+
+Runs the module-level imports of each script (or any module names given
+with -m) in a fresh interpreter under `python -X importtime`, and prints the
+total plus the slowest top-level imports and the slowest individual modules,
+so a heavy import that sneaks back to the top of a script shows up at once.
+
+    python import_profile.py app.py datascience.py dsproject.py miniproject.py
+    python import_profile.py -m matplotlib.pyplot -m plotly.express
+"""
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def script_imports(path):
+    """Module names imported at the top level of `path` (not inside functions or branches)."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module != "__future__":
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def profile_imports(modules, cwd=None):
+    """
+    Import `modules` in a fresh interpreter; return a list of
+    (self_us, cumulative_us, depth, module) in import-completion order.
+    """
+    code = "".join(f"import {name}\n" for name in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2, m.group(4)))
+    return rows
+
+
+def summarize(label, rows, top=10):
+    roots = [r for r in rows if r[2] == 0]
+    total = sum(r[1] for r in roots)
+    print(f"{label}: {total / 1000:.1f} ms, {len(rows)} modules")
+    print("  slowest top-level imports (cumulative):")
+    for _, cumulative, _, name in sorted(roots, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {name}")
+    print("  slowest modules (self):")
+    for self_us, _, _, name in sorted(rows, key=lambda r: r[0], reverse=True)[:top]:
+        print(f"    {self_us / 1000:8.1f} ms  {name}")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise `python -X importtime` for scripts or modules.")
+    parser.add_argument("scripts", nargs="*", help="Python scripts whose top-level imports are profiled")
+    parser.add_argument("-m", "--module", action="append", default=[], help="profile importing this module")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+    if not args.scripts and not args.module:
+        parser.error("give at least one script or -m module")
+
+    for path in args.scripts:
+        cwd = os.path.dirname(os.path.abspath(path))
+        summarize(path, profile_imports(script_imports(path), cwd=cwd), args.top)
+    if args.module:
+        summarize(", ".join(args.module), profile_imports(args.module), args.top)
+
+
+if __name__ == "__main__":
+    main()
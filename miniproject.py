@@ -1,34 +1,32 @@
 import streamlit as st
-import pandas as pd
 import os
 
-# ✅ Use Streamlit’s temp directory to avoid permission issues
+from expense_backends import get_expense_store, import_legacy_csv
+
+# Legacy single-file ledger, imported into the store on first run
 FILENAME = os.path.join(os.getcwd(), 'expense_data.csv')
+DATA_DIR = os.path.join(os.getcwd(), 'expense_data')
+# This app keeps one ledger; app.py keeps one per user in its own data directory
+LEDGER = 'default'
+
+store = get_expense_store(DATA_DIR)
 
 def initialize_file():
-    if not os.path.exists(FILENAME):
-        df = pd.DataFrame(columns=['Date', 'Amount', 'Category', 'Description'])
-        df.to_csv(FILENAME, index=False)
+    if os.path.exists(FILENAME):
+        import_legacy_csv(store, LEDGER, FILENAME)
+    store.init_user(LEDGER)
 
 def add_expense(date, amount, category, description):
-    df = pd.read_csv(FILENAME)
-    new_row = {'Date': date, 'Amount': amount, 'Category': category, 'Description': description}
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(FILENAME, index=False)
+    store.add(LEDGER, date, amount, category, description)
 
 def view_expenses():
-    df = pd.read_csv(FILENAME)
-    return df
+    return store.read(LEDGER)
 
-def delete_expense(index):
-    df = pd.read_csv(FILENAME)
-    df = df.drop(index)
-    df.to_csv(FILENAME, index=False)
+def delete_expense(expense_id):
+    store.delete(LEDGER, expense_id)
 
-def edit_expense(index, date, amount, category, description):
-    df = pd.read_csv(FILENAME)
-    df.loc[index, ['Date', 'Amount', 'Category', 'Description']] = [date, amount, category, description]
-    df.to_csv(FILENAME, index=False)
+def edit_expense(expense_id, date, amount, category, description):
+    store.edit(LEDGER, expense_id, date, amount, category, description)
 
 # --- STREAMLIT APP ---
 st.set_page_config(page_title="Expense Tracker", page_icon="💰")
@@ -52,8 +50,9 @@ df = view_expenses()
 if not df.empty:
     st.header("📜 All Expenses")
 
-    for i, row in df.iterrows():
-        with st.expander(f"{row['Date']} | ₹{row['Amount']} - {row['Category']}"):
+    for _, row in df.iterrows():
+        i = int(row['ID'])
+        with st.expander(f"{row['Date'].date()} | ₹{row['Amount']} - {row['Category']}"):
             st.write(f"**Description:** {row['Description']}")
             
             col1, col2 = st.columns(2)
@@ -61,7 +60,7 @@ if not df.empty:
             with col1:
                 if st.button(f"✏️ Edit {i}", key=f"edit_{i}"):
                     with st.form(f"edit_form_{i}"):
-                        new_date = st.date_input("Date", pd.to_datetime(row['Date']))
+                        new_date = st.date_input("Date", row['Date'].date())
                         new_amount = st.number_input("Amount", value=float(row['Amount']), min_value=0.0, format="%.2f")
                         new_category = st.text_input("Category", value=row['Category'])
                         new_description = st.text_area("Description", value=row['Description'])
@@ -77,7 +76,7 @@ if not df.empty:
                     st.warning("Expense deleted.")
                     st.rerun()
 
-    total = df['Amount'].sum()
+    total = store.rollup(LEDGER).total
     st.write(f"### 💵 Total Expenses: ₹{total:.2f}")
     if salary > 0:
         balance = salary - total
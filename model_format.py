@@ -0,0 +1,110 @@
+# model_format.py
+"""
+Coefficient-only model files.
+
+The bundled models are plain linear models, so everything needed to score
+them is a few numbers. `export_model` writes a scikit-learn LinearRegression
+or LogisticRegression to a small versioned JSON file (feature names,
+coefficients, intercept, classes), and `LinearModel` scores it with NumPy
+alone. Loading is a json.load: no scikit-learn import and no unpickling.
+
+    python model_format.py speed_model.pkl speed_model.json
+    python model_format.py injury_model.pkl injury_model.json
+"""
+import argparse
+import json
+
+import numpy as np
+
+FORMAT = "linear-model"
+FORMAT_VERSION = 1
+KINDS = {"LinearRegression": "linear_regression", "LogisticRegression": "logistic_regression"}
+
+
+class LinearModel:
+    """NumPy scorer for an exported linear or logistic regression."""
+
+    def __init__(self, kind, features, coef, intercept, classes=None):
+        self.kind = kind
+        self.features = list(features)
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1, len(self.features))
+        self.intercept = np.asarray(intercept, dtype=np.float64).reshape(-1)
+        self.classes = None if classes is None else list(classes)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        if spec.get("format") != FORMAT or spec.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} {FORMAT} file")
+        return cls(spec["kind"], spec["features"], spec["coef"], spec["intercept"], spec.get("classes"))
+
+    def _matrix(self, X):
+        if hasattr(X, "columns"):
+            return np.column_stack([X[f].to_numpy(dtype=np.float64) for f in self.features])
+        return np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+
+    def decision_function(self, X):
+        scores = self._matrix(X) @ self.coef.T + self.intercept
+        return scores[:, 0] if scores.shape[1] == 1 else scores
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if self.kind == "linear_regression":
+            return scores
+        classes = np.asarray(self.classes)
+        if scores.ndim == 1:
+            return classes[(scores > 0).astype(np.intp)]
+        return classes[scores.argmax(axis=1)]
+
+    def predict_proba(self, X):
+        if self.kind != "logistic_regression":
+            raise AttributeError("predict_proba is only available for logistic regression")
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack([1.0 - p, p])
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+def export_model(model, path, features=None):
+    """Write a fitted scikit-learn linear/logistic regression to `path` as JSON."""
+    kind = KINDS.get(type(model).__name__)
+    if kind is None:
+        raise TypeError(f"Cannot export {type(model).__name__}; only {', '.join(KINDS)} are supported")
+    if features is None:
+        features = getattr(model, "feature_names_in_", None)
+        if features is None:
+            raise ValueError("Model has no feature names; pass features=[...]")
+    import sklearn
+    spec = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "kind": kind,
+        "features": [str(f) for f in features],
+        "coef": np.atleast_2d(model.coef_).tolist(),
+        "intercept": np.atleast_1d(model.intercept_).tolist(),
+        "exported_with": f"scikit-learn {sklearn.__version__}",
+    }
+    if kind == "logistic_regression":
+        spec["classes"] = np.asarray(model.classes_).tolist()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a pickled scikit-learn linear model to JSON (needs scikit-learn).")
+    parser.add_argument("source", help="joblib/pickle model file")
+    parser.add_argument("dest", help="output .json file")
+    args = parser.parse_args(argv)
+
+    import joblib
+    model = joblib.load(args.source)
+    export_model(model, args.dest)
+    print(f"wrote {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
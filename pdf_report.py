@@ -0,0 +1,136 @@
+# pdf_report.py
+"""
+Monthly summary PDF for app.py.
+
+Reports are rendered on demand in a small background thread pool and the
+finished bytes are kept in a process-wide LRU keyed by
+(username, year, month, ledger version, salary), so downloading the same
+month twice, from any session, costs nothing.
+"""
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHED_REPORTS = 64
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+_reportlab = None
+
+
+def load_reportlab():
+    """Import reportlab once per process (raises RuntimeError if missing)."""
+    global _reportlab
+    if _reportlab is None:
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.units import inch
+            from reportlab.pdfgen import canvas
+        except Exception as e:
+            raise RuntimeError("reportlab not installed. Install via `pip install reportlab` to enable PDF export.") from e
+        _reportlab = (letter, inch, canvas)
+    return _reportlab
+
+
+def transaction_lines(df_month):
+    """Format every transaction row at once: 'date | ₹amount | category | description[:60]'."""
+    df = df_month.sort_values("Date", kind="stable")
+    dates = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
+    amounts = np.char.mod("%.2f", df["Amount"].to_numpy(dtype=float))
+    return (
+        dates + " | ₹" + amounts + " | "
+        + df["Category"].astype(str) + " | "
+        + df["Description"].astype(str).str[:60]
+    ).tolist()
+
+
+def _write_lines(c, lines, x, top, next_top, bottom, step, font, size):
+    """Draw `lines` with one text object per page instead of one drawString per row."""
+    first = 0
+    page_top = top
+    while first < len(lines):
+        if first:
+            c.showPage()
+            page_top = next_top
+        per_page = max(1, int((page_top - bottom) // step) + 1)
+        text = c.beginText(x, page_top)
+        text.setFont(font, size)
+        text.setLeading(step)
+        text.textLines(lines[first:first + per_page])
+        c.drawText(text)
+        first += per_page
+
+
+def create_month_summary_pdf(username, df_month, year, month, salary):
+    """
+    Create a simple PDF summary for the selected month for the given user.
+    Requires reportlab (pip install reportlab).
+    Returns bytes of PDF.
+    """
+    letter, inch, canvas = load_reportlab()
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    title = f"Expense Summary - {username} - {month}/{year}"
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(1 * inch, height - 1 * inch, title)
+
+    c.setFont("Helvetica", 11)
+    total = df_month["Amount"].sum()
+    balance = salary - total if salary is not None else None
+    c.drawString(1 * inch, height - 1.4 * inch, f"Total expenses: ₹{total:.2f}")
+    if salary is not None:
+        c.drawString(1 * inch, height - 1.6 * inch, f"Salary: ₹{salary:.2f}")
+        c.drawString(1 * inch, height - 1.8 * inch, f"Remaining balance: ₹{balance:.2f}")
+
+    # Show top categories
+    c.drawString(1 * inch, height - 2.2 * inch, "Top categories:")
+    cat_sum = df_month.groupby("Category")["Amount"].sum().sort_values(ascending=False)
+    cat_lines = [f"{cat}: ₹{amt:.2f}" for cat, amt in cat_sum.items()]
+    _write_lines(c, cat_lines, 1.1 * inch, height - 2.5 * inch, height - 1 * inch, 1 * inch, 0.2 * inch, "Helvetica", 11)
+
+    # Add table of transactions (simple)
+    c.showPage()
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(1 * inch, height - 1 * inch, "Transactions")
+    _write_lines(c, transaction_lines(df_month), 1 * inch, height - 1.4 * inch, height - 1 * inch, 1 * inch, 0.18 * inch, "Helvetica", 10)
+
+    c.save()
+    return buffer.getvalue()
+
+
+# ---------------------------
+# Background rendering + cache
+# ---------------------------
+
+def request_report(key, build):
+    """
+    Return the Future for report `key`, submitting `build()` to the worker
+    pool the first time it is asked for.
+    """
+    with _reports_lock:
+        future = _reports.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            _reports.move_to_end(key)
+            return future
+        future = _reports[key] = _executor.submit(build)
+        while len(_reports) > MAX_CACHED_REPORTS:
+            _reports.popitem(last=False)
+        return future
+
+
+def cached_report(key):
+    """PDF bytes for `key` if already rendered, else None."""
+    with _reports_lock:
+        future = _reports.get(key)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        _reports.move_to_end(key)
+        return future.result()
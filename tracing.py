@@ -0,0 +1,166 @@
+# tracing.py
+"""
+Optional timing spans for the Streamlit scripts.
+
+Set APP_TRACE=1 to record how long each instrumented stage of a rerun takes
+(and how many rows it touched). With tracing off, `span()` returns a shared
+no-op context manager and `traced` leaves functions undecorated, so the
+instrumentation costs next to nothing.
+
+While on, every span is kept for the current rerun (shown in the sidebar
+timing panel to the users listed in APP_TRACE_ADMINS) and added to a bounded
+per-span sample buffer. `dump_stats()` writes count/mean/p50/p95 per span as
+JSON to APP_TRACE_FILE (default trace_stats.json), from the panel's button
+or, when APP_TRACE_FILE is set, at exit.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+ENABLED = os.environ.get("APP_TRACE", "").lower() in ("1", "true", "yes", "on")
+ADMINS = {u.strip() for u in os.environ.get("APP_TRACE_ADMINS", "").split(",") if u.strip()}
+STATS_FILE = os.environ.get("APP_TRACE_FILE", "trace_stats.json")
+MAX_SAMPLES = 2000
+
+_local = threading.local()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_samples_lock = threading.Lock()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def rows(self):
+        return None
+
+    @rows.setter
+    def rows(self, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "rows", "start", "seconds", "depth")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.seconds = None
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append(self)
+        with _samples_lock:
+            _samples[self.name].append((self.seconds, self.rows))
+        return False
+
+
+def span(name, rows=None):
+    """Context manager timing `name`; set `.rows` on the result to record a row count."""
+    return Span(name, rows) if ENABLED else _NULL_SPAN
+
+
+def traced(name=None):
+    """Decorator form of span(); a no-op when tracing is off."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_rerun():
+    """Begin collecting spans for a new rerun on this thread."""
+    if ENABLED:
+        _local.spans = []
+        _local.stack = []
+
+
+def rerun_spans():
+    """Spans finished so far in this thread's rerun, in completion order."""
+    return list(getattr(_local, "spans", None) or [])
+
+
+def is_admin(username):
+    return ENABLED and username in ADMINS
+
+
+def stats():
+    """{span name: {count, mean_ms, p50_ms, p95_ms, max_ms, rows_p50}} over the buffered samples."""
+    import numpy as np
+    with _samples_lock:
+        snapshot = {name: list(samples) for name, samples in _samples.items()}
+    result = {}
+    for name, samples in sorted(snapshot.items()):
+        seconds = np.array([s for s, _ in samples]) * 1000
+        rows = [r for _, r in samples if r is not None]
+        result[name] = {
+            "count": len(samples),
+            "mean_ms": round(float(seconds.mean()), 3),
+            "p50_ms": round(float(np.percentile(seconds, 50)), 3),
+            "p95_ms": round(float(np.percentile(seconds, 95)), 3),
+            "max_ms": round(float(seconds.max()), 3),
+            "rows_p50": float(np.median(rows)) if rows else None,
+        }
+    return result
+
+
+def dump_stats(path=None):
+    """Write stats() as JSON to `path` (default STATS_FILE); returns the path."""
+    path = path or STATS_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "spans": stats()}, f, indent=2)
+    return path
+
+
+def render_panel(st, spans=None):
+    """Collapsible per-rerun timing breakdown for the sidebar."""
+    spans = rerun_spans() if spans is None else spans
+    with st.sidebar.expander("⏱️ Timing (this rerun)", expanded=False):
+        if not spans:
+            st.caption("No spans recorded.")
+        else:
+            # Parents finish after their children; list them in start order with indentation.
+            ordered = sorted(spans, key=lambda s: s.start)
+            st.table([{
+                "span": " " * s.depth + s.name,
+                "ms": round(s.seconds * 1000, 1),
+                "rows": "" if s.rows is None else f"{s.rows:,}",
+            } for s in ordered])
+        if st.button("Dump p50/p95 stats", key="trace_dump"):
+            st.caption(f"Wrote {dump_stats()}")
+
+
+if ENABLED and os.environ.get("APP_TRACE_FILE"):
+    atexit.register(dump_stats)
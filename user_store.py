@@ -0,0 +1,115 @@
+# user_store.py
+"""
+Account storage for app.py.
+
+Users live in a small SQLite database (WAL mode) keyed by username, so a
+login is a primary-key lookup and a sign-up is a single atomic
+insert-if-absent instead of a read/rewrite of users.csv. The legacy
+users.csv can be imported once with `python user_store.py import users.csv`
+(app.py does this automatically the first time it creates the database).
+"""
+import csv
+import os
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class UserStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.created = not os.path.exists(db_path)
+        # Streamlit serves sessions from several threads; sqlite3 connections
+        # must stay on the thread that opened them.
+        self._local = threading.local()
+        self._conn().execute(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, username, password_hash):
+        """Insert a new user; returns False if the username is already taken."""
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)",
+            (username, password_hash),
+        )
+        return cur.rowcount == 1
+
+    def password_hash(self, username):
+        """Return the stored hash for `username`, or None if there is no such user."""
+        row = self._conn().execute(
+            "SELECT password_hash FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def exists(self, username):
+        return self.password_hash(username) is not None
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def import_csv(self, path):
+        """Import a legacy users.csv (username,password_hash); existing users are kept. Returns rows added."""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [
+                (r["username"], r["password_hash"])
+                for r in csv.DictReader(f)
+                if r.get("username") and r.get("password_hash")
+            ]
+        conn = self._conn()
+        before = self.count()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.count() - before
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_user_store(db_path):
+    """Return the process-wide UserStore for `db_path` (app.py reruns reuse it)."""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = UserStore(db_path)
+        return store
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the app.py user database.")
+    parser.add_argument("--db", default=os.path.join(os.getcwd(), "users.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_imp = sub.add_parser("import", help="import a legacy users.csv")
+    p_imp.add_argument("path")
+    args = parser.parse_args(argv)
+
+    store = UserStore(args.db)
+    if args.command == "import":
+        added = store.import_csv(args.path)
+        print(f"Imported {added} users ({store.count()} total)")
+
+
+if __name__ == "__main__":
+    main()